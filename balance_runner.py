@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game_logic import Game, SCREEN_WIDTH, SCREEN_HEIGHT
+from events import EnemyLeaked, WaveStarted
+from policies import POLICIES, make_policy, policy_arg
+from telemetry import Telemetry
+
+# Как часто (в тиках) скриптовый игрок принимает решения
+ACT_EVERY = 30
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def play_game(seed, policy_name, max_wave, max_ticks):
+    # Одна безголовая партия. Возвращает словарь с результатами
+    game = Game(SCREEN_WIDTH, SCREEN_HEIGHT, seed=seed)
+    policy = make_policy(policy_name)
+    game.start_wave()
+
+    money_curve = [game.money]
+    leaks_per_wave = [0]
+    game.drain_events()
+    # Счетчики урона и убийств по башням - из телеметрии, без записи в файл
+    telemetry = Telemetry()
+
+    while not game.game_over and game.wave <= max_wave and game.tick < max_ticks:
+        policy.act(game)
+        game.step(ACT_EVERY)
+
+        events = game.drain_events()
+        telemetry.consume(events)
+        for event in events:
+            if isinstance(event, EnemyLeaked):
+                leaks_per_wave[-1] += 1
+            elif isinstance(event, WaveStarted):
+                money_curve.append(event.money)
+                leaks_per_wave.append(0)
+
+    return {
+        'seed': seed,
+        'policy': policy_name,
+        'wave': game.wave,
+        'score': game.score,
+        'money': game.money,
+        'lives': game.lives,
+        'leaks': sum(leaks_per_wave),
+        'ticks': game.tick,
+        'towers': len(game.towers),
+        'game_over': game.game_over,
+        'money_curve': money_curve,
+        'leaks_per_wave': leaks_per_wave,
+        'tower_damage': telemetry.per_tower(telemetry.tower_damage),
+        'tower_kills': telemetry.per_tower(telemetry.tower_kills),
+    }
+
+
+def _play_game(args):
+    return play_game(*args)
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, result):
+        self.file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class SqliteSink:
+    # Результаты пишутся пачками в одной транзакции, чтобы не коммитить каждую партию
+    BATCH = 500
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS balance_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                seed INTEGER NOT NULL,
+                policy TEXT NOT NULL,
+                wave INTEGER NOT NULL,
+                score INTEGER NOT NULL,
+                money INTEGER NOT NULL,
+                leaks INTEGER NOT NULL,
+                ticks INTEGER NOT NULL,
+                money_curve TEXT NOT NULL,
+                leaks_per_wave TEXT NOT NULL,
+                tower_damage TEXT,
+                tower_kills TEXT
+            )
+        ''')
+        # В таблице из прежних прогонов нет колонок урона и убийств по башням
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(balance_results)')}
+        for column in ('tower_damage', 'tower_kills'):
+            if column not in columns:
+                self.conn.execute(f'ALTER TABLE balance_results ADD COLUMN {column} TEXT')
+        self.pending = []
+
+    def write(self, result):
+        self.pending.append((
+            result['seed'], result['policy'], result['wave'], result['score'],
+            result['money'], result['leaks'], result['ticks'],
+            json.dumps(result['money_curve']), json.dumps(result['leaks_per_wave']),
+            json.dumps(result['tower_damage']), json.dumps(result['tower_kills'])
+        ))
+        if len(self.pending) >= self.BATCH:
+            self.flush()
+
+    def flush(self):
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO balance_results
+                    (seed, policy, wave, score, money, leaks, ticks, money_curve, leaks_per_wave,
+                     tower_damage, tower_kills)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', self.pending)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def open_sink(path):
+    if path is None:
+        return None
+    if path.endswith('.db') or path.endswith('.sqlite'):
+        return SqliteSink(path)
+    return JsonlSink(path)
+
+
+def summarize(results):
+    summary = {'games': len(results)}
+    if not results:
+        return summary
+    for key in ('wave', 'score', 'leaks', 'money'):
+        values = np.array([result[key] for result in results])
+        summary[key] = {
+            f"p{p}": float(value) for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+        }
+        summary[key]['mean'] = float(values.mean())
+    summary['game_over_rate'] = sum(result['game_over'] for result in results) / len(results)
+    return summary
+
+
+def run_batch(games, policy_name, seed=0, max_wave=30, max_ticks=500000, workers=None, sink=None):
+    workers = workers or os.cpu_count() or 1
+    jobs = [(seed + i, policy_name, max_wave, max_ticks) for i in range(games)]
+    # Крупные куски снижают накладные расходы на пересылку задач между процессами
+    chunksize = max(1, games // (workers * 8))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_play_game, jobs, chunksize=chunksize):
+            results.append(result)
+            if sink is not None:
+                sink.write(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный прогон безголовых партий для настройки баланса")
+    parser.add_argument('--games', type=int, default=1000, help="количество партий")
+    parser.add_argument('--policy', type=policy_arg, default='path',
+                        help=f"стратегия игрока: {', '.join(sorted(POLICIES))} или plan:<файл плана>")
+    parser.add_argument('--seed', type=int, default=0, help="seed первой партии, дальше seed+1, seed+2...")
+    parser.add_argument('--max-wave', type=int, default=30, help="остановить партию после этой волны")
+    parser.add_argument('--max-ticks', type=int, default=500000, help="ограничение длины партии в тиках")
+    parser.add_argument('--workers', type=int, default=None, help="число процессов (по умолчанию все ядра)")
+    parser.add_argument('--out', default=None, help="файл результатов: .jsonl или .db/.sqlite")
+    args = parser.parse_args(argv)
+
+    sink = open_sink(args.out)
+    started = time.perf_counter()
+    try:
+        results = run_batch(args.games, args.policy, args.seed, args.max_wave, args.max_ticks,
+                            args.workers, sink)
+    finally:
+        if sink is not None:
+            sink.close()
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(results)
+    summary['seconds'] = round(elapsed, 2)
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
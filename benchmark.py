@@ -0,0 +1,221 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from game_logic import Game, SCREEN_WIDTH, SCREEN_HEIGHT
+from policies import PATH_SPOTS
+import snapshot
+from profiler import PhaseTimer
+
+BASELINE_FILE = 'bench_baseline.json'
+
+# Допустимое падение ticks/sec относительно сохраненной базы
+DEFAULT_THRESHOLD = 0.15
+
+
+def _build(seed, wave, towers, level, warmup):
+    # Игра с заданной волной и башнями. Жизни и деньги бесконечные,
+    # чтобы сценарий не закончился посреди замера
+    game = Game(SCREEN_WIDTH, SCREEN_HEIGHT, seed=seed)
+    game.money = 10 ** 9
+    game.lives = 10 ** 9
+    for x, y in PATH_SPOTS[:towers]:
+        game.place_tower(x, y)
+    for index in range(len(game.towers)):
+        for _ in range(level - 1):
+            game.upgrade_tower(index)
+    game.wave = wave - 1
+    game.start_wave()
+    game.step(warmup)
+    return game
+
+
+# Канонические сценарии: имя -> (описание, параметры _build)
+SCENARIOS = {
+    'early': ("первые волны, четыре башни", dict(seed=1, wave=1, towers=4, level=1, warmup=0)),
+    'enemy_cap': ("волна 30, 50 врагов на поле", dict(seed=2, wave=30, towers=6, level=1, warmup=600)),
+    'boss': ("волна 10 с боссом", dict(seed=3, wave=10, towers=8, level=3, warmup=120)),
+    'heavy_fire': ("24 башни 10 уровня, много снарядов", dict(seed=4, wave=25, towers=24, level=10, warmup=600)),
+}
+
+
+# Сценарии из файлов снимков (snapshot.py): имя -> путь. Поздняя волна
+# загружается сразу, без прогона симуляции до нее
+SNAPSHOTS = {}
+
+
+def add_snapshot(path):
+    name = 'snap:' + os.path.splitext(os.path.basename(path))[0]
+    SNAPSHOTS[name] = path
+    return name
+
+
+def build_scenario(name):
+    if name in SNAPSHOTS:
+        game = snapshot.load_file(SNAPSHOTS[name])
+        game.money = 10 ** 9
+        game.lives = 10 ** 9
+        return game
+    _, params = SCENARIOS[name]
+    return _build(**params)
+
+
+def measure_latency(name, ticks):
+    game = build_scenario(name)
+    samples = np.zeros(ticks, dtype=np.int64)
+    clock = time.perf_counter_ns
+    gc.collect()
+    for i in range(ticks):
+        started = clock()
+        game.step()
+        samples[i] = clock() - started
+    total = samples.sum() / 1e9
+    p50, p90, p99 = np.percentile(samples, (50, 90, 99)) / 1000
+    memory = game.memory_report()
+    return {
+        'ticks': ticks,
+        'ticks_per_sec': round(ticks / total, 1),
+        'p50_us': round(float(p50), 1),
+        'p90_us': round(float(p90), 1),
+        'p99_us': round(float(p99), 1),
+        'max_us': round(float(samples.max()) / 1000, 1),
+        'entities_peak_kib': round(memory['wave_peak']['bytes'] / 1024, 1),
+        'entities_allocated_kib': round(memory['total_allocated_bytes'] / 1024, 1),
+    }
+
+
+def measure_allocations(name, ticks):
+    # Отдельный прогон под tracemalloc: он сильно замедляет код и исказил бы время
+    game = build_scenario(name)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    blocks_before = sys.getallocatedblocks()
+    game.step(ticks)
+    after, peak = tracemalloc.get_traced_memory()
+    blocks_after = sys.getallocatedblocks()
+    tracemalloc.stop()
+    return {
+        'alloc_peak_kib': round((peak - before) / 1024, 1),
+        'alloc_retained_kib': round((after - before) / 1024, 1),
+        'alloc_blocks_per_tick': round((blocks_after - blocks_before) / ticks, 2),
+    }
+
+
+def measure_phases(name, ticks):
+    # Отдельный прогон с таймером фаз Game.update: среднее время фазы на тик (мкс)
+    game = build_scenario(name)
+    game.profiler = PhaseTimer()
+    game.step(ticks)
+    stats = game.profiler.stats()['phases']
+    return {phase: round(stats[phase]['total_ms'] * 1000 / ticks, 2) for phase in stats}
+
+
+def run_benchmarks(names, ticks, phases=False):
+    results = {}
+    for name in names:
+        result = measure_latency(name, ticks)
+        result.update(measure_allocations(name, ticks))
+        if phases:
+            result['phases_us'] = measure_phases(name, ticks)
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Возвращает список сценариев, где пропускная способность упала сильнее порога
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]['ticks_per_sec']
+        change = result['ticks_per_sec'] / expected - 1
+        result['vs_baseline'] = round(change, 3)
+        if change < -threshold:
+            regressions.append((name, expected, result['ticks_per_sec'], change))
+    return regressions
+
+
+def print_table(results):
+    print(f"{'Сценарий':<12} {'тик/с':>9} {'p50 мкс':>9} {'p90 мкс':>9} {'p99 мкс':>9} "
+          f"{'пик КиБ':>9} {'блоков/тик':>11} {'сущн. КиБ':>10} {'к базе':>8}")
+    for name, r in results.items():
+        change = f"{r['vs_baseline']:+.1%}" if 'vs_baseline' in r else "-"
+        print(f"{name:<12} {r['ticks_per_sec']:>9} {r['p50_us']:>9} {r['p90_us']:>9} {r['p99_us']:>9} "
+              f"{r['alloc_peak_kib']:>9} {r['alloc_blocks_per_tick']:>11} {r['entities_peak_kib']:>10} {change:>8}")
+
+
+def print_phases(results):
+    # Среднее время фаз тика, мкс
+    phases = []
+    for r in results.values():
+        for phase in r.get('phases_us', {}):
+            if phase not in phases:
+                phases.append(phase)
+    if not phases:
+        return
+    print()
+    print(f"{'мкс/тик':<12} " + " ".join(f"{phase:>11}" for phase in phases))
+    for name, r in results.items():
+        values = r.get('phases_us', {})
+        print(f"{name:<12} " + " ".join(f"{values.get(phase, 0):>11}" for phase in phases))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк горячего пути симуляции game_logic.Game.update")
+    parser.add_argument('scenarios', nargs='*', help=f"сценарии: {', '.join(SCENARIOS)} (по умолчанию все)")
+    parser.add_argument('--ticks', type=int, default=2000, help="тиков на сценарий")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="файл с базовыми результатами")
+    parser.add_argument('--save-baseline', action='store_true', help="сохранить результаты как новую базу")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое падение ticks/sec, доля (0.15 = 15%%)")
+    parser.add_argument('--json', default=None, help="записать результаты в JSON-файл")
+    parser.add_argument('--phases', action='store_true', help="показать время по фазам тика")
+    parser.add_argument('--snapshot', action='append', default=[],
+                        help="дополнительный сценарий из файла снимка (python snapshot.py ...), можно несколько")
+    args = parser.parse_args(argv)
+
+    snapshot_names = [add_snapshot(path) for path in args.snapshot]
+    names = args.scenarios or ([] if snapshot_names else list(SCENARIOS))
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    names += snapshot_names
+    results = run_benchmarks(names, args.ticks, args.phases)
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+
+    print_table(results)
+    print_phases(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"База сохранена в {args.baseline}")
+
+    for name, expected, actual, change in regressions:
+        print(f"РЕГРЕССИЯ {name}: {actual} тик/с против {expected} в базе ({change:+.1%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
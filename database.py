@@ -1,71 +1,524 @@
 import sqlite3
 import datetime
+import atexit
+import bisect
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+
+from records_schema import DB_PATH, TOP_CACHE_SIZE, INSERT_RECORDS, migrate, select_records_page, cached_page
+
+# Адрес общего сервера таблицы лидеров (leaderboard_server.py) в виде host:port.
+# Если переменная не задана или сервер недоступен, рекорды идут в SQLite напрямую
+LEADERBOARD_ENV = 'TD_LEADERBOARD'
+LEADERBOARD_TIMEOUT = 2.0
+# После неудачного запроса сервер не опрашивается столько секунд
+LEADERBOARD_RETRY = 30.0
+# Ответ сервера старше стольких секунд отдается, но обновляется в фоне
+LEADERBOARD_REFRESH = 5.0
+# Сколько чтение ждет ответа, которого еще нет в кэше, прежде чем взять данные из SQLite
+LEADERBOARD_READ_WAIT = 0.2
+# Предел числа запомненных ответов
+LEADERBOARD_CACHE_SIZE = 256
 
 def create_connection():
     conn = None
     try:
-        conn = sqlite3.connect('records.db')
+        conn = sqlite3.connect(DB_PATH)
         return conn
     except sqlite3.Error as e:
         print(f"Ошибка подключения к БД: {e}")
     return conn
 
+_local = threading.local()
+
+def read_connection():
+    # Долгоживущее соединение для чтения, свое у каждого потока
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = create_connection()
+        _local.conn = conn
+    return conn
+
 def init_db():
     conn = create_connection()
     if conn is not None:
         try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS records (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    player_name TEXT NOT NULL,
-                    wave INTEGER NOT NULL,
-                    score INTEGER NOT NULL,
-                    timestamp TEXT NOT NULL
-                )
-            ''')
-            conn.commit()
+            migrate(conn)
         except sqlite3.Error as e:
             print(f"Ошибка создания таблицы: {e}")
         finally:
             conn.close()
 
-def save_record(player_name, wave, score):
-    conn = create_connection()
-    if conn is not None:
+
+class LeaderboardClient:
+    # Клиент сервера таблицы лидеров: запросы и ответы - строки JSON, одно соединение
+    # на процесс. Сеть трогают только фоновые потоки: сохранения уходят из RecordWriter,
+    # чтения - из потока клиента. Вызывающий поток берет последний ответ из кэша и
+    # ждет ответа, которого там еще нет, не дольше read_wait
+    def __init__(self, address, timeout=LEADERBOARD_TIMEOUT, retry=LEADERBOARD_RETRY,
+                 refresh=LEADERBOARD_REFRESH, read_wait=LEADERBOARD_READ_WAIT):
+        host, _, port = address.rpartition(':')
+        self.address = (host or '127.0.0.1', int(port))
+        self.timeout = timeout
+        self.retry = retry
+        self.refresh = refresh
+        self.read_wait = read_wait
+        self.sock = None
+        self.file = None
+        self.retry_at = 0.0
+        self.closed = False
+        self.lock = threading.Lock()
+        # Ответы на чтения: ключ запроса -> (время ответа, ответ); ждущие ответа запросы
+        self.cache = {}
+        self.pending = {}
+        self.cache_lock = threading.Lock()
+        self.fetches = queue.Queue()
+        self.thread = None
+
+    def request(self, op, **fields):
+        # Синхронный запрос (только из фоновых потоков). Ответ сервера или None,
+        # если сервер недоступен - тогда вызывающий работает с SQLite сам
+        message = (json.dumps(dict(fields, op=op), ensure_ascii=False) + "\n").encode('utf-8')
+        with self.lock:
+            if self.closed or time.monotonic() < self.retry_at:
+                return None
+            error = None
+            # Вторая попытка - на случай, если сервер закрыл старое соединение.
+            # Повтор сохранения безопасен: сервер отбрасывает повторную сессию
+            for _ in range(2):
+                try:
+                    if self.sock is None:
+                        self._connect()
+                    self.sock.sendall(message)
+                    line = self.file.readline()
+                    if not line:
+                        raise ConnectionError("соединение закрыто сервером")
+                    response = json.loads(line)
+                    break
+                except (OSError, ValueError) as e:
+                    self._close()
+                    error = e
+            else:
+                print(f"Сервер таблицы лидеров недоступен: {error}")
+                self.retry_at = time.monotonic() + self.retry
+                return None
+        if not response.get('ok'):
+            print(f"Ошибка сервера таблицы лидеров: {response.get('error')}")
+            return None
+        return response
+
+    def cached(self, op, wait=None, **fields):
+        # Последний ответ сервера на такой запрос или None. Устаревший или отсутствующий
+        # ответ запрашивается в фоне; отсутствующий ждется не дольше wait (по умолчанию read_wait)
+        key = (op, json.dumps(fields, sort_keys=True))
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            event = self.pending.get(key)
+            stale = entry is None or time.monotonic() - entry[0] > self.refresh
+            if stale and event is None and not self.closed and time.monotonic() >= self.retry_at:
+                event = self.pending[key] = threading.Event()
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="leaderboard-client", daemon=True)
+                    self.thread.start()
+                self.fetches.put((key, op, fields))
+        if entry is None and event is not None:
+            event.wait(self.read_wait if wait is None else wait)
+            with self.cache_lock:
+                entry = self.cache.get(key)
+        return entry[1] if entry is not None else None
+
+    def prefetch(self, op, **fields):
+        self.cached(op, wait=0, **fields)
+
+    def save(self, batch):
+        # Пачка записей (player_name, wave, score, timestamp, session_id) одним запросом.
+        # Вызывается из потока RecordWriter; False - сервер недоступен
+        response = self.request('save', records=[list(record) for record in batch])
+        if response is None:
+            return False
+        # Прочитанные ответы устарели: их отдают, пока в фоне не придут новые
+        with self.cache_lock:
+            self.cache = {key: (0.0, value) for key, (_, value) in self.cache.items()}
+        self.prefetch('top', limit=TOP_CACHE_SIZE)
+        return True
+
+    def close(self):
+        self.closed = True
+        self.fetches.put(None)
+        with self.lock:
+            self._close()
+
+    def _run(self):
+        while True:
+            item = self.fetches.get()
+            if item is None:
+                return
+            key, op, fields = item
+            response = self.request(op, **fields)
+            with self.cache_lock:
+                if response is not None:
+                    if len(self.cache) >= LEADERBOARD_CACHE_SIZE:
+                        self.cache.clear()
+                    self.cache[key] = (time.monotonic(), response)
+                self.pending.pop(key).set()
+
+    def _connect(self):
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.file = self.sock.makefile('rb')
+
+    def _close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+        self.sock = None
+        self.file = None
+
+
+def _open_leaderboard():
+    address = os.environ.get(LEADERBOARD_ENV)
+    if not address:
+        return None
+    try:
+        return LeaderboardClient(address)
+    except ValueError:
+        print(f"Неверный адрес сервера таблицы лидеров в {LEADERBOARD_ENV}: {address}")
+    return None
+
+
+class RecordWriter:
+    # Фоновая запись рекордов: одно долгоживущее соединение в отдельном потоке,
+    # вызывающий поток только кладет запись в очередь. Если задан сервер таблицы
+    # лидеров (remote), пачка уходит на него, а SQLite - запасной путь.
+    # Каждая сессия сохраняется ровно один раз
+    def __init__(self, path=None, remote=None):
+        self.path = path or DB_PATH
+        self.remote = remote
+        self.queue = queue.Queue()
+        self.sessions = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, session_id, player_name, wave, score, timestamp):
+        with self.lock:
+            if session_id in self.sessions:
+                return False
+            self.sessions.add(session_id)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="record-writer", daemon=True)
+                self.thread.start()
+        self.queue.put((player_name, wave, score, timestamp, session_id))
+        return True
+
+    def flush(self):
+        # Ждет, пока все поставленные в очередь записи будут закоммичены
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+
+    def _run(self):
+        conn = sqlite3.connect(self.path)
         try:
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO records (player_name, wave, score, timestamp)
-                VALUES (?, ?, ?, ?)
-            ''', (player_name, wave, score, timestamp))
-            conn.commit()
-            return True
-        except sqlite3.Error as e:
-            print(f"Ошибка сохранения рекорда: {e}")
+            while True:
+                item = self.queue.get()
+                batch = []
+                stop = item is None
+                if not stop:
+                    batch.append(item)
+                # Забираем все, что успело накопиться, и пишем одной транзакцией
+                while not stop:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                    else:
+                        batch.append(item)
+                try:
+                    if batch and (self.remote is None or not self.remote.save(batch)):
+                        with conn:
+                            conn.executemany(INSERT_RECORDS, batch)
+                except sqlite3.Error as e:
+                    print(f"Ошибка сохранения рекорда: {e}")
+                finally:
+                    # Стоп-сигнал тоже был взят из очереди
+                    for _ in range(len(batch) + (1 if stop else 0)):
+                        self.queue.task_done()
+                if stop:
+                    return
         finally:
             conn.close()
-    return False
+
+
+_leaderboard = _open_leaderboard()
+if _leaderboard is not None:
+    atexit.register(_leaderboard.close)
+    # Топ понадобится первым (таблица рекордов, конец партии) - запрашиваем заранее
+    _leaderboard.prefetch('top', limit=TOP_CACHE_SIZE)
+
+# Регистрируется после клиента, поэтому при выходе закрывается раньше него
+_writer = RecordWriter(remote=_leaderboard)
+atexit.register(_writer.close)
+
+def _flush_local():
+    # Перед чтением из SQLite ждем фоновую запись. С сервером записи уходят на него,
+    # и ждать их ради запасного чтения не нужно: поток записи может ждать сеть
+    if _leaderboard is None:
+        _writer.flush()
+
+
+class TopRecordsCache:
+    # Лучшие записи в памяти, по убыванию (score, wave). Загружается из БД
+    # один раз, дальше новые рекорды вставляются в нужное место без запросов
+    def __init__(self, size=TOP_CACHE_SIZE):
+        self.size = size
+        self.records = None
+        self.keys = []
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def get(self, limit):
+        with self.lock:
+            if self.records is None:
+                self._load()
+            if self.records is None or (limit > len(self.records) and not self.complete):
+                return None
+            return self.records[:limit]
+
+    def page(self, after, limit):
+        # Страница из кэша (см. records_schema.cached_page) или None
+        with self.lock:
+            if self.records is None:
+                self._load()
+            if self.records is None:
+                return None
+            return cached_page(self.records, after, limit, self.complete)
+
+    def add(self, record):
+        with self.lock:
+            if self.records is None:
+                return
+            _, wave, score, _ = record
+            key = (-score, -wave)
+            # Среди равных новая запись идет последней, как и в БД (больший id)
+            position = bisect.bisect_right(self.keys, key)
+            if position >= self.size:
+                return
+            self.records.insert(position, record)
+            self.keys.insert(position, key)
+            if len(self.records) > self.size:
+                self.records.pop()
+                self.keys.pop()
+                self.complete = False
+
+    def _load(self):
+        _flush_local()
+        records = _query_top(self.size)
+        if records is None:
+            return
+        self.records = records
+        self.keys = [(-score, -wave) for _, wave, score, _ in records]
+        self.complete = len(records) < self.size
+
+
+_top_cache = TopRecordsCache()
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+def save_record(player_name, wave, score, session_id=None):
+    # Запись уходит в фоновый поток (и оттуда на сервер, если он задан).
+    # Повторные вызовы с тем же session_id игнорируются
+    if session_id is None:
+        session_id = new_session_id()
+    # Одна метка времени и для БД, и для кэша, чтобы порядок записей в них совпадал
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if not _writer.submit(session_id, player_name, wave, score, timestamp):
+        return False
+    _top_cache.add((player_name, wave, score, timestamp))
+    return True
+
+def _query_top(limit):
+    conn = read_connection()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT player_name, wave, score, timestamp
+            FROM records
+            ORDER BY score DESC, wave DESC, id
+            LIMIT ?
+        ''', (limit,))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Ошибка получения рекордов: {e}")
+    return None
+
+def _remote_top(limit=TOP_CACHE_SIZE):
+    # Лучшие записи с сервера из кэша клиента или None
+    if _leaderboard is None:
+        return None
+    response = _leaderboard.cached('top', limit=max(limit, TOP_CACHE_SIZE))
+    if response is None:
+        return None
+    return [tuple(record) for record in response['records']]
 
 def get_top_records(limit=10):
-    conn = create_connection()
-    records = []
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT player_name, wave, score, timestamp
-                FROM records
-                ORDER BY score DESC, wave DESC
-                LIMIT ?
-            ''', (limit,))
-            records = cursor.fetchall()
-        except sqlite3.Error as e:
-            print(f"Ошибка получения рекордов: {e}")
-        finally:
-            conn.close()
+    records = _remote_top(limit)
+    if records is not None:
+        return records[:limit]
+    records = _top_cache.get(limit)
+    if records is None:
+        _flush_local()
+        records = _query_top(limit) or []
     return records
 
+def _remote_page(after, limit):
+    # Страница с сервера: в пределах его топа - из кэша клиента, дальше - запросом
+    top = _remote_top()
+    if top is not None and (after is None or after[2] is None):
+        page = cached_page(top, after, limit, len(top) < TOP_CACHE_SIZE)
+        if page is not None:
+            return page
+    response = _leaderboard.cached('page', after=after, limit=limit)
+    if response is None:
+        return None
+    next_cursor = response['next']
+    return ([tuple(record) for record in response['records']],
+            tuple(next_cursor) if next_cursor is not None else None)
+
+def get_records_page(after=None, limit=10):
+    # Постраничный просмотр таблицы по ключу (keyset pagination).
+    # after - курсор с предыдущей страницы или None для первой.
+    # Возвращает (записи, курсор следующей страницы или None).
+    # Страницы в пределах кэша лучших записей берутся из памяти, дальше - из БД
+    if _leaderboard is not None:
+        page = _remote_page(after, limit)
+        if page is not None:
+            return page
+    if after is None or after[2] is None:
+        page = _top_cache.page(after, limit)
+        if page is not None:
+            return page
+    _flush_local()
+    conn = read_connection()
+    if conn is None:
+        return [], None
+    try:
+        return select_records_page(conn, after, limit)
+    except sqlite3.Error as e:
+        print(f"Ошибка получения рекордов: {e}")
+        return [], None
+
+def get_rank(score, wave):
+    # Место, которое занимает результат (score, wave) в таблице: 1 + число записей лучше него
+    top = _remote_top()
+    if top is not None:
+        better = sum(1 for _, other_wave, other_score, _ in top
+                     if other_score > score or (other_score == score and other_wave > wave))
+        if better < len(top) or len(top) < TOP_CACHE_SIZE:
+            return better + 1
+        response = _leaderboard.cached('rank', score=score, wave=wave)
+        if response is not None:
+            return response['rank']
+    _flush_local()
+    conn = read_connection()
+    if conn is None:
+        return None
+    try:
+        better = conn.execute('''
+            SELECT COUNT(*) FROM records
+            WHERE score > ? OR (score = ? AND wave > ?)
+        ''', (score, score, wave)).fetchone()[0]
+        return better + 1
+    except sqlite3.Error as e:
+        print(f"Ошибка получения рекордов: {e}")
+    return None
+
+def save_snapshot(session_id, player_name, wave, score, data):
+    # Снимок прерванной партии; новый снимок той же сессии заменяет старый
+    conn = create_connection()
+    if conn is None:
+        return False
+    try:
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO snapshots (session_id, player_name, wave, score, timestamp, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (session_id, player_name, wave, score, timestamp, data))
+        return True
+    except sqlite3.Error as e:
+        print(f"Ошибка сохранения снимка: {e}")
+        return False
+    finally:
+        conn.close()
+
+def get_snapshot_info():
+    # (session_id, player_name, wave, score) последней прерванной партии или None
+    conn = read_connection()
+    if conn is None:
+        return None
+    try:
+        return conn.execute('''
+            SELECT session_id, player_name, wave, score
+            FROM snapshots
+            ORDER BY id DESC
+            LIMIT 1
+        ''').fetchone()
+    except sqlite3.Error as e:
+        print(f"Ошибка получения снимка: {e}")
+    return None
+
+def load_snapshot(session_id):
+    # Данные снимка сессии или None
+    conn = read_connection()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute('SELECT data FROM snapshots WHERE session_id = ?', (session_id,)).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        print(f"Ошибка получения снимка: {e}")
+    return None
+
+def delete_snapshot(session_id):
+    conn = create_connection()
+    if conn is None:
+        return
+    try:
+        with conn:
+            conn.execute('DELETE FROM snapshots WHERE session_id = ?', (session_id,))
+    except sqlite3.Error as e:
+        print(f"Ошибка удаления снимка: {e}")
+    finally:
+        conn.close()
+
+def finish_snapshots():
+    # Прерванные партии, которые уже не продолжат: результат уходит в рекорды, снимок удаляется
+    conn = read_connection()
+    if conn is None:
+        return
+    try:
+        rows = conn.execute('SELECT session_id, player_name, wave, score FROM snapshots').fetchall()
+    except sqlite3.Error as e:
+        print(f"Ошибка получения снимка: {e}")
+        return
+    for session_id, player_name, wave, score in rows:
+        save_record(player_name, wave, score, session_id)
+        delete_snapshot(session_id)
+
 # Инициализация БД при импорте
-init_db()
\ No newline at end of file
+init_db()
@@ -0,0 +1,201 @@
+import numpy as np
+
+from entity_types import ENEMY_TYPES, ENEMY_KINDS
+
+
+class EnemyStore:
+    # Враги на поле в виде набора колонок NumPy (structure of arrays).
+    # Живые строки всегда лежат плотно в диапазоне [0, count)
+    COLUMNS = (
+        ('x', np.float64),
+        ('y', np.float64),
+        ('progress', np.float64),
+        ('speed', np.float64),
+        ('health', np.int64),
+        ('max_health', np.int64),
+        ('reward', np.int64),
+        ('kind', np.int8),
+        ('alive', np.bool_),
+        ('hit_effect', np.int16),
+    )
+
+    def __init__(self, path, capacity=64):
+        # path - скомпилированный путь (path_table.PathTable)
+        self.path = path
+        self.count = 0
+        self.capacity = 0
+        for name, dtype in self.COLUMNS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self._grow(capacity)
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def row_bytes(cls):
+        # Сколько байт занимает один враг во всех колонках
+        return sum(np.dtype(dtype).itemsize for _, dtype in cls.COLUMNS)
+
+    def _grow(self, capacity):
+        for name, dtype in self.COLUMNS:
+            column = np.zeros(capacity, dtype=dtype)
+            column[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def spawn(self, kinds, speed, health, reward):
+        # Добавляет группу врагов в начало пути. kinds - коды типов,
+        # speed/health/reward - характеристики по коду типа на текущей волне
+        n = len(kinds)
+        if not n:
+            return
+        capacity = max(16, self.capacity)
+        while self.count + n > capacity:
+            capacity *= 2
+        if capacity != self.capacity:
+            self._grow(capacity)
+        rows = slice(self.count, self.count + n)
+        self.kind[rows] = kinds
+        self.speed[rows] = speed[kinds]
+        self.health[rows] = health[kinds]
+        self.max_health[rows] = health[kinds]
+        self.reward[rows] = reward[kinds]
+        self.progress[rows] = 0
+        self.x[rows] = self.path.x[0]
+        self.y[rows] = self.path.y[0]
+        self.alive[rows] = True
+        self.hit_effect[rows] = 0
+        self.count += n
+
+    def move(self):
+        # Один тик движения всех врагов по пути: progress растет на скорость,
+        # координаты берутся из таблицы пути. Строки остаются упорядочены
+        # по убыванию progress (первым идет ближайший к базе), поэтому
+        # дошедшие до базы всегда лежат в начале.
+        # Возвращает маску врагов, дошедших до базы в этом тике
+        n = self.count
+        progress = self.progress[:n]
+        length = self.path.length
+
+        progress += self.speed[:n]
+        np.minimum(progress, length, out=progress)
+        self.x[:n], self.y[:n] = self.path.positions(progress)
+        leaked = progress >= length
+
+        # Эффект попадания затухает
+        hit_effect = self.hit_effect[:n]
+        hit_effect[hit_effect > 0] -= 1
+
+        # Быстрые враги обгоняют медленных - тогда восстанавливаем порядок
+        if n > 1 and (progress[1:] > progress[:-1]).any():
+            order = np.argsort(-progress, kind='stable')
+            for name, _ in self.COLUMNS:
+                column = getattr(self, name)
+                column[:n] = column[:n][order]
+            leaked = leaked[order]
+        return leaked
+
+    def ranges_within(self, intervals, order_key):
+        # Диапазоны строк [lo, hi), чей progress попадает в участки intervals
+        # (массив пар progress_from, progress_to).
+        # order_key - progress[:count] с обратным знаком (по возрастанию)
+        if not len(intervals):
+            return []
+        lo = order_key.searchsorted(-intervals[:, 1], side='left').tolist()
+        hi = order_key.searchsorted(-intervals[:, 0], side='right').tolist()
+        return [(start, end) for start, end in zip(lo, hi) if start < end]
+
+    def remove(self, mask):
+        # Удаляет строки по маске одним проходом, сохраняя порядок остальных
+        n = self.count
+        keep = ~mask[:n]
+        kept = int(keep.sum())
+        if kept == n:
+            return
+        for name, _ in self.COLUMNS:
+            column = getattr(self, name)
+            column[:kept] = column[:n][keep]
+        self.count = kept
+
+    def compact(self):
+        # Убирает всех выбывших (убитых и дошедших до базы) за один проход
+        if self.count:
+            self.remove(~self.alive[:self.count])
+
+    def damage(self, rows, damage):
+        # Наносит урон живым строкам из rows. Убитые остаются в колонках
+        # до compact(). Возвращает (задетые строки, убитые строки)
+        rows = rows[self.alive[rows]]
+        if len(rows) == 0:
+            return rows, rows
+        self.health[rows] -= damage
+        self.hit_effect[rows] = 10
+        killed = rows[self.health[rows] <= 0]
+        self.health[killed] = 0
+        self.alive[killed] = False
+        return rows, killed
+
+    def views(self):
+        return [EnemyView(self, row) for row in range(self.count)]
+
+
+class EnemyView:
+    # Объект с интерфейсом прежнего Enemy поверх строки хранилища.
+    # Действителен до следующего обновления игры
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def x(self):
+        return float(self.store.x[self.row])
+
+    @property
+    def y(self):
+        return float(self.store.y[self.row])
+
+    @property
+    def progress(self):
+        return float(self.store.progress[self.row])
+
+    @property
+    def path_index(self):
+        return int(self.store.path.segments(self.store.progress[self.row]))
+
+    @property
+    def speed(self):
+        return float(self.store.speed[self.row])
+
+    @property
+    def health(self):
+        return int(self.store.health[self.row])
+
+    @property
+    def max_health(self):
+        return int(self.store.max_health[self.row])
+
+    @property
+    def reward(self):
+        return int(self.store.reward[self.row])
+
+    @property
+    def type(self):
+        return ENEMY_KINDS[self.store.kind[self.row]]
+
+    @property
+    def color(self):
+        return ENEMY_TYPES[self.store.kind[self.row]].color
+
+    @property
+    def alive(self):
+        return bool(self.store.alive[self.row])
+
+    @property
+    def hit_effect(self):
+        return int(self.store.hit_effect[self.row])
+
+    def take_damage(self, damage):
+        _, killed = self.store.damage(np.array([self.row]), damage)
+        return int(self.store.reward[killed].sum())
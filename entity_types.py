@@ -0,0 +1,32 @@
+from collections import namedtuple
+
+# Общие таблицы характеристик сущностей. Экземпляры хранят только то,
+# что у них меняется, а цвета и формулы роста по волнам берут отсюда
+
+# Характеристика врага на волне wave = base + wave * per_wave
+EnemyType = namedtuple('EnemyType', [
+    'name', 'color', 'weight',
+    'speed', 'speed_per_wave',
+    'health', 'health_per_wave',
+    'reward', 'reward_per_wave',
+])
+
+# Порядок важен: индекс в кортеже - код типа в хранилище врагов
+ENEMY_TYPES = (
+    EnemyType('normal', (255, 50, 50), 0.7, 1.0, 0.05, 50, 8, 10, 2),  # Красный
+    EnemyType('fast', (50, 255, 50), 0.2, 2.0, 0.05, 30, 5, 15, 3),  # Зеленый
+    EnemyType('tank', (100, 100, 255), 0.1, 0.7, 0.03, 150, 15, 25, 5),  # Синий
+    EnemyType('boss', (255, 215, 0), 0.0, 0.5, 0.0, 500, 50, 100, 20),  # Золотой, только каждую 5-ю волну
+)
+
+ENEMY_KINDS = tuple(enemy_type.name for enemy_type in ENEMY_TYPES)
+KIND_CODES = {kind: code for code, kind in enumerate(ENEMY_KINDS)}
+BOSS_KIND = KIND_CODES['boss']
+
+# Башня: стартовые значения и прибавка за каждое улучшение
+TowerType = namedtuple('TowerType', [
+    'color', 'range', 'damage', 'cooldown', 'upgrade_cost',
+    'range_step', 'damage_step', 'cooldown_step', 'min_cooldown', 'upgrade_cost_step',
+])
+
+TOWER_TYPE = TowerType((0, 128, 255), 100, 20, 1000, 50, 20, 20, 100, 300, 30)
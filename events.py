@@ -0,0 +1,25 @@
+from collections import deque, namedtuple
+
+# События симуляции. Игра складывает их в очередь, интерфейс и статистика
+# забирают их через Game.drain_events() вместо того, чтобы пересматривать списки врагов.
+# У всех событий первое поле - номер тика
+
+# Враг появился в начале пути
+EnemySpawned = namedtuple('EnemySpawned', ['tick', 'kind'])
+# Снаряд башни tower взорвался в (x, y) и задел targets врагов
+EnemyHit = namedtuple('EnemyHit', ['tick', 'tower', 'damage', 'x', 'y', 'targets'])
+# Враг убит взрывом снаряда башни tower
+EnemyKilled = namedtuple('EnemyKilled', ['tick', 'kind', 'reward', 'tower', 'x', 'y'])
+# Враг дошел до базы
+EnemyLeaked = namedtuple('EnemyLeaked', ['tick', 'kind'])
+# Началась волна wave из enemies врагов, money - деньги после бонуса за волну
+WaveStarted = namedtuple('WaveStarted', ['tick', 'wave', 'enemies', 'money'])
+# Все враги волны появились и покинули поле
+WaveEnded = namedtuple('WaveEnded', ['tick', 'wave'])
+
+# Сколько событий хранится, если их никто не забирает (старые вытесняются)
+EVENT_QUEUE_SIZE = 4096
+
+
+def make_event_queue():
+    return deque(maxlen=EVENT_QUEUE_SIZE)
@@ -1,9 +1,21 @@
+import argparse
 import random
 import math
-from database import save_record, get_top_records
+import sys
+import time
+from database import save_record, get_top_records, get_rank
+
+# Размер поля по умолчанию (клетки по краям - граница)
+MAP_WIDTH = 10
+MAP_HEIGHT = 10
+
+# ANSI: курсор в начало экрана и очистка до конца - кадр перерисовывается на месте
+ANSI_HOME = "\x1b[H\x1b[J"
 
 
 class Tower:
+    __slots__ = ('x', 'y', 'range', 'damage', 'cooldown', 'last_shot', 'level', 'upgrade_cost')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -29,18 +41,20 @@ class Tower:
 
 
 class Enemy:
-    def __init__(self, wave):
+    __slots__ = ('x', 'y', 'speed', 'health', 'max_health', 'reward', 'alive')
+
+    def __init__(self, wave, height=MAP_HEIGHT):
         self.x = 0
-        self.y = random.randint(1, 9)
+        self.y = random.randint(1, height - 1)
         self.speed = 0.5 + wave * 0.02
         self.health = 50 + wave * 10
         self.max_health = self.health
         self.reward = 10 + wave * 2
         self.alive = True
 
-    def move(self):
+    def move(self, width=MAP_WIDTH):
         self.x += self.speed
-        return self.x < 10  # True если враг ещё на поле
+        return self.x < width  # True если враг ещё на поле
 
     def take_damage(self, damage):
         self.health -= damage
@@ -51,7 +65,19 @@ class Enemy:
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, width=MAP_WIDTH, height=MAP_HEIGHT, ansi=False):
+        self.width = width
+        self.height = height
+        self.ansi = ansi
+        # Буфер кадра: строки поля по 2 байта на клетку ("T ") и перевод строки.
+        # Фон с границей готовится один раз, на каждом кадре копируется в буфер
+        self.row_bytes = 2 * width + 1
+        border = b"# " * width + b"\n"
+        inner = b"# " + b". " * (width - 2) + b"# \n"
+        self.background = border + inner * (height - 2) + border
+        self.frame = bytearray(self.background)
+        # В пакетном режиме сообщения игры не выводятся
+        self.quiet = False
         self.player_name = ""
         self.wave = 0
         self.score = 0
@@ -62,27 +88,31 @@ class Game:
         self.game_time = 0
         self.game_over = False
 
+    def say(self, text):
+        if not self.quiet:
+            print(text)
+
     def start_wave(self):
         self.wave += 1
         # Создаем врагов для текущей волны
         enemy_count = 5 + self.wave * 2
         for _ in range(enemy_count):
-            self.enemies.append(Enemy(self.wave))
+            self.enemies.append(Enemy(self.wave, self.height))
 
     def place_tower(self, x, y):
         # Проверяем достаточно ли денег
         if self.money < 50:
-            print("Недостаточно денег! Нужно 50 монет.")
+            self.say("Недостаточно денег! Нужно 50 монет.")
             return False
 
         # Проверяем можно ли поставить башню
-        if x < 1 or x > 9 or y < 1 or y > 9:
-            print("Нельзя ставить башню за пределами поля!")
+        if x < 1 or x > self.width - 1 or y < 1 or y > self.height - 1:
+            self.say("Нельзя ставить башню за пределами поля!")
             return False
 
         for tower in self.towers:
             if tower.x == x and tower.y == y:
-                print("Здесь уже есть башня!")
+                self.say("Здесь уже есть башня!")
                 return False
 
         # Ставим башню
@@ -92,12 +122,12 @@ class Game:
 
     def upgrade_tower(self, index):
         if index < 0 or index >= len(self.towers):
-            print("Неверный индекс башни!")
+            self.say("Неверный индекс башни!")
             return False
 
         tower = self.towers[index]
         if self.money < tower.upgrade_cost:
-            print(f"Недостаточно денег! Нужно {tower.upgrade_cost} монет.")
+            self.say(f"Недостаточно денег! Нужно {tower.upgrade_cost} монет.")
             return False
 
         self.money -= tower.upgrade_cost
@@ -111,7 +141,7 @@ class Game:
 
         # Обновляем врагов
         for enemy in self.enemies[:]:
-            if enemy.move():
+            if enemy.move(self.width):
                 if not enemy.alive:
                     self.enemies.remove(enemy)
             else:
@@ -120,7 +150,7 @@ class Game:
                 self.enemies.remove(enemy)
                 if self.lives <= 0:
                     self.game_over = True
-                    print("Игра окончена! Ваша база разрушена.")
+                    self.say("Игра окончена! Ваша база разрушена.")
                     return
 
         # Стрельба башен
@@ -151,48 +181,33 @@ class Game:
             self.start_wave()
 
     def draw_map(self):
-        print("\n" + "=" * 30)
-        print(f"Волна: {self.wave} | Жизни: {self.lives} | Деньги: {self.money} | Очки: {self.score}")
-        print("=" * 30)
-
-        # Рисуем игровое поле 10x10
-        for y in range(10):
-            for x in range(10):
-                # Проверяем башни
-                is_tower = False
-                for i, tower in enumerate(self.towers):
-                    if int(tower.x) == x and int(tower.y) == y:
-                        print("T", end=" ")
-                        is_tower = True
-                        break
-
-                if is_tower:
-                    continue
-
-                # Проверяем врагов
-                is_enemy = False
-                for enemy in self.enemies:
-                    if int(enemy.x) == x and int(enemy.y) == y:
-                        health_percent = enemy.health / enemy.max_health
-                        if health_percent > 0.7:
-                            print("E", end=" ")
-                        elif health_percent > 0.3:
-                            print("e", end=" ")
-                        else:
-                            print("w", end=" ")
-                        is_enemy = True
-                        break
-
-                if is_enemy:
-                    continue
-
-                # Пустое пространство
-                if x == 0 or x == 9 or y == 0 or y == 9:
-                    print("#", end=" ")  # Граница
+        # Кадр собирается в буфере за один проход по сущностям и выводится одной записью
+        frame = self.frame
+        frame[:] = self.background
+        width, height, row_bytes = self.width, self.height, self.row_bytes
+
+        # Враги в обратном порядке, затем башни: в клетке остается башня,
+        # а из нескольких врагов - первый по списку
+        for enemy in reversed(self.enemies):
+            x, y = int(enemy.x), int(enemy.y)
+            if 0 <= x < width and 0 <= y < height:
+                health_percent = enemy.health / enemy.max_health
+                if health_percent > 0.7:
+                    frame[y * row_bytes + 2 * x] = 69  # E
+                elif health_percent > 0.3:
+                    frame[y * row_bytes + 2 * x] = 101  # e
                 else:
-                    print(".", end=" ")  # Пустое поле
+                    frame[y * row_bytes + 2 * x] = 119  # w
+        for tower in self.towers:
+            x, y = int(tower.x), int(tower.y)
+            if 0 <= x < width and 0 <= y < height:
+                frame[y * row_bytes + 2 * x] = 84  # T
 
-            print()  # Новая строка
+        line = "=" * 30
+        header = (f"\n{line}\nВолна: {self.wave} | Жизни: {self.lives} | Деньги: {self.money} | "
+                  f"Очки: {self.score}\n{line}\n")
+        sys.stdout.write((ANSI_HOME if self.ansi else "") + header + frame.decode('ascii'))
+        sys.stdout.flush()
 
     def show_towers(self):
         print("\nВаши башни:")
@@ -217,8 +232,110 @@ class Game:
             print(f"{name:<15} {wave:<6} {score:<10} {date:<20}")
 
 
-def main():
-    game = Game()
+# Команды пакетного режима: place X Y, upgrade N (номер башни с 1), skip N (тиков),
+# map (вывести поле), status (строка состояния). Пустые строки и # - комментарии
+BATCH_COMMANDS = ('place', 'upgrade', 'skip', 'map', 'status')
+
+
+def status_line(game, ticks):
+    return (f"тик {ticks} | волна {game.wave} | жизни {game.lives} | деньги {game.money} | "
+            f"очки {game.score} | башен {len(game.towers)} | врагов {len(game.enemies)}")
+
+
+def run_script(game, lines, snapshot_every=0, show_map=False):
+    # Выполняет команды без вопросов и без вывода поля на каждом тике.
+    # Каждые snapshot_every тиков печатается строка состояния (и поле, если show_map).
+    # Возвращает словарь с итогами
+    game.quiet = True
+    stats = {'ticks': 0, 'commands': 0, 'failed': 0, 'errors': 0}
+
+    def advance(count):
+        for _ in range(count):
+            if game.game_over:
+                return
+            game.update(1)
+            stats['ticks'] += 1
+            if snapshot_every and stats['ticks'] % snapshot_every == 0:
+                if show_map:
+                    game.draw_map()
+                print(status_line(game, stats['ticks']))
+
+    for number, line in enumerate(lines, 1):
+        if game.game_over:
+            break
+        parts = line.split('#', 1)[0].split()
+        if not parts:
+            continue
+        command, args = parts[0].lower(), parts[1:]
+        try:
+            if command not in BATCH_COMMANDS:
+                raise ValueError(f"неизвестная команда {command}")
+            values = [int(arg) for arg in args]
+            if command == 'place':
+                x, y = values
+                ok = game.place_tower(x, y)
+            elif command == 'upgrade':
+                index, = values
+                ok = bool(game.upgrade_tower(index - 1))
+            elif command == 'skip':
+                count, = values or [1]
+                advance(count)
+                ok = True
+            elif command == 'map':
+                game.draw_map()
+                ok = True
+            else:
+                print(status_line(game, stats['ticks']))
+                ok = True
+        except ValueError as e:
+            # ValueError и от int(), и от неверного числа аргументов
+            print(f"Ошибка в строке {number}: {line.strip()} ({e})", file=sys.stderr)
+            stats['errors'] += 1
+            continue
+        stats['commands'] += 1
+        if not ok:
+            stats['failed'] += 1
+    return stats
+
+
+def run_batch(game, source, snapshot_every=0, show_map=False):
+    started = time.perf_counter()
+    game.start_wave()
+    stats = run_script(game, source, snapshot_every, show_map)
+    elapsed = time.perf_counter() - started
+
+    print("=" * 30)
+    print(status_line(game, stats['ticks']))
+    print(f"Игра окончена: {'да' if game.game_over else 'нет'}")
+    print(f"Команд: {stats['commands']} (не выполнено {stats['failed']}, ошибок {stats['errors']})")
+    print(f"Время: {elapsed:.3f} с, тиков в секунду: {stats['ticks'] / max(elapsed, 1e-9):.0f}")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tower Defence в консоли")
+    parser.add_argument('--width', type=int, default=MAP_WIDTH, help="ширина поля в клетках")
+    parser.add_argument('--height', type=int, default=MAP_HEIGHT, help="высота поля в клетках")
+    parser.add_argument('--ansi', action='store_true', help="перерисовывать поле на месте, без прокрутки")
+    parser.add_argument('--script', help="пакетный режим: файл команд или - для stdin")
+    parser.add_argument('--seed', type=int, default=None, help="seed случайных чисел")
+    parser.add_argument('--snapshot-every', type=int, default=0, help="печатать состояние каждые N тиков")
+    parser.add_argument('--map', action='store_true', help="печатать поле вместе с состоянием")
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    game = Game(max(3, args.width), max(3, args.height), args.ansi)
+
+    if args.script is not None:
+        # Без вопросов и без сохранения рекорда: для нагрузочных прогонов и баланса
+        game.player_name = "Скрипт"
+        if args.script == '-':
+            run_batch(game, sys.stdin, args.snapshot_every, args.map)
+        else:
+            with open(args.script, encoding='utf-8') as f:
+                run_batch(game, f, args.snapshot_every, args.map)
+        return
     game.player_name = input("Введите ваше имя: ").strip() or "Игрок"
 
     print("\nДобро пожаловать в Tower Defence!")
@@ -247,8 +364,8 @@ def main():
 
         if choice == "1":
             try:
-                x = int(input("Введите X координату (1-8): "))
-                y = int(input("Введите Y координату (1-8): "))
+                x = int(input(f"Введите X координату (1-{game.width - 2}): "))
+                y = int(input(f"Введите Y координату (1-{game.height - 2}): "))
                 if game.place_tower(x, y):
                     print(f"Башня установлена в позиции ({x}, {y})!")
             except ValueError:
@@ -279,6 +396,9 @@ def main():
     # Сохраняем результат
     if save_record(game.player_name, game.wave, game.score):
         print("\nВаш рекорд сохранён!")
+        rank = get_rank(game.score, game.wave)
+        if rank is not None:
+            print(f"Место в таблице рекордов: {rank}")
     else:
         print("\nНе удалось сохранить рекорд.")
 
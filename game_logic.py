@@ -1,169 +1,104 @@
-import math
 import random
-
-class Projectile:
-    def __init__(self, start_x, start_y, target_x, target_y, damage):
-        self.x = start_x
-        self.y = start_y
-        self.target_x = target_x
-        self.target_y = target_y
-        self.damage = damage
-        self.speed = 8.0
-        self.active = True
-        self.trail = []
-
-        # Рассчитываем направление
-        dx = target_x - start_x
-        dy = target_y - start_y
-        dist = math.sqrt(dx * dx + dy * dy)
-        if dist > 0:
-            self.dx = dx / dist * self.speed
-            self.dy = dy / dist * self.speed
-        else:
-            self.dx = 0
-            self.dy = 0
-            self.active = False
-
-    def update(self):
-        if not self.active:
-            return False
-
-        # Добавляем текущую позицию в след
-        self.trail.append((self.x, self.y))
-        if len(self.trail) > 5:
-            self.trail.pop(0)
-
-        # Обновляем позицию
-        self.x += self.dx
-        self.y += self.dy
-
-        # Проверяем достижение цели
-        dist_to_target = math.sqrt((self.x - self.target_x) ** 2 + (self.y - self.target_y) ** 2)
-        return dist_to_target < 10  # Увеличили порог попадания
+import sys
+
+import numpy as np
+
+from entity_types import TOWER_TYPE
+from path_table import PathTable
+from enemy_store import EnemyStore
+from spatial_grid import SpatialGrid
+from waves import WaveSchedule
+from events import (EnemySpawned, EnemyHit, EnemyKilled, EnemyLeaked, WaveStarted, WaveEnded,
+                    make_event_queue)
+from projectile_pool import ProjectilePool
+from occupancy import Occupancy, OUT_OF_BOUNDS, ON_PATH, UNDER_PANEL, TOO_CLOSE
+
+# Фиксированная длина тика симуляции (мс), ~60 кадров в секунду
+TICK_MS = 16
+
+# Размер игрового поля по умолчанию (как окно в main.py)
+SCREEN_WIDTH = 1000
+SCREEN_HEIGHT = 700
+
+# Радиус взрыва снаряда
+SPLASH_RADIUS = 50
+
+# Стоимость новой башни
+TOWER_COST = 50
+# Минимальное расстояние между центрами башен
+TOWER_SPACING = 40
+# Отступ от краев поля, ближе которого башни не ставятся
+PLACEMENT_MARGIN = 100
+# Высота панели интерфейса вверху экрана: под ней башни не ставятся
+PANEL_HEIGHT = 222
+
+PLACEMENT_ERRORS = {
+    OUT_OF_BOUNDS: "Ставьте башни в центре карты!",
+    ON_PATH: "Нельзя ставить башню на дорогу!",
+    UNDER_PANEL: "Нельзя ставить башню под панелью!",
+    TOO_CLOSE: "Слишком близко к другой башне!",
+}
+
+
+def check_placement(occupancy, x, y):
+    # (можно ли поставить башню, сообщение) по сеткам Game.occupancy или их копии из снимка
+    reason = occupancy.check(x, y)
+    if reason:
+        return False, PLACEMENT_ERRORS[reason]
+    return True, ""
+
+# Режимы выбора цели: первый к базе, последний, самый живучий, ближайший к башне
+TARGET_MODES = ('first', 'last', 'strongest', 'nearest')
+TARGET_MODE_NAMES = {'first': "первый", 'last': "последний", 'strongest': "сильнейший", 'nearest': "ближайший"}
 
 
+class Tower:
+    # Компактная башня без __dict__; общие константы - в TOWER_TYPE
+    __slots__ = ('x', 'y', 'range', 'damage', 'cooldown', 'last_shot', 'level', 'upgrade_cost',
+                 'target_mode', 'path_intervals')
 
+    color = TOWER_TYPE.color
 
-class Tower:
     def __init__(self, x, y):
         self.x = x
         self.y = y
-        self.range = 100
-        self.damage = 20
-        self.cooldown = 1000
+        self.range = TOWER_TYPE.range
+        self.damage = TOWER_TYPE.damage
+        self.cooldown = TOWER_TYPE.cooldown
         self.last_shot = 0
         self.level = 1
-        self.upgrade_cost = 50
-        self.projectiles = []
-        self.color = (0, 128, 255)
+        self.upgrade_cost = TOWER_TYPE.upgrade_cost
+        self.target_mode = 'nearest'
+        # Участки пути в радиусе башни, считаются игрой при первом выстреле
+        self.path_intervals = None
 
     def upgrade(self):
         self.level += 1
-        self.damage += 20
-        self.range += 20
-        self.cooldown = max(300, self.cooldown - 100)
-        self.upgrade_cost += 30
+        self.damage += TOWER_TYPE.damage_step
+        self.range += TOWER_TYPE.range_step
+        self.path_intervals = None
+        self.cooldown = max(TOWER_TYPE.min_cooldown, self.cooldown - TOWER_TYPE.cooldown_step)
+        self.upgrade_cost += TOWER_TYPE.upgrade_cost_step
         return self.upgrade_cost
 
     def can_shoot(self, current_time):
         return current_time - self.last_shot >= self.cooldown
 
-    def distance_to(self, enemy):
-        return math.sqrt((self.x - enemy.x) ** 2 + (self.y - enemy.y) ** 2)
-
-    def update_projectiles(self):
-        hits = []
-        i = 0
-        while i < len(self.projectiles):
-            if self.projectiles[i].update():
-                # Снаряд достиг цели
-                hits.append({
-                    'damage': self.projectiles[i].damage,
-                    'target_x': self.projectiles[i].target_x,
-                    'target_y': self.projectiles[i].target_y
-                })
-                del self.projectiles[i]
-            else:
-                i += 1
-        return hits
-
-
-class Enemy:
-    def __init__(self, wave, path):  # Добавлены аргументы wave и path
-        self.path = path
-        self.path_index = 0
-        self.x, self.y = self.path[self.path_index]
-        self.type = 'normal' #по умолчанию обычный враг
-        # Случайный выбор типа врага
-        enemy_type = random.choices(
-            ['normal', 'fast', 'tank'],
-            weights=[0.7, 0.2, 0.1],
-            k=1
-        )[0]
-
-        if enemy_type == 'normal':
-            self.speed = 1.0 + wave * 0.05
-            self.health = 50 + wave * 8
-            self.reward = 10 + wave * 2
-            self.color = (255, 50, 50)  # Красный
-        elif enemy_type == 'fast':
-            self.speed = 2.0 + wave * 0.05
-            self.health = 30 + wave * 5
-            self.reward = 15 + wave * 3
-            self.color = (50, 255, 50)  # Зеленый
-        elif enemy_type == 'tank':
-            self.speed = 0.7 + wave * 0.03
-            self.health = 150 + wave * 15
-            self.reward = 25 + wave * 5
-            self.color = (100, 100, 255)  # Синий
-
-        self.max_health = self.health
-        self.alive = True
-        self.hit_effect = 0
-        self.type = enemy_type
-
-    def move(self):
-        if self.path_index >= len(self.path) - 1:
-            return False
-
-        target_x, target_y = self.path[self.path_index + 1]
-        dx = target_x - self.x
-        dy = target_y - self.y
-        dist = math.sqrt(dx * dx + dy * dy)
-
-        if dist == 0:
-            self.path_index += 1
-            return True
-
-        if dist < self.speed:
-            self.path_index += 1
-            self.x, self.y = target_x, target_y
-        else:
-            self.x += dx / dist * self.speed
-            self.y += dy / dist * self.speed
-
-        return True
-
-    def take_damage(self, damage):
-        self.health -= damage
-        self.hit_effect = 10
-        if self.health <= 0:
-            self.health = 0
-            self.alive = False
-            return self.reward
-        return 0
-
-
 
 class Game:
-    def __init__(self, screen_width, screen_height):
+    def __init__(self, screen_width, screen_height, seed=None):
+        # Собственный генератор случайных чисел: одинаковый seed и одинаковые
+        # действия игрока дают одинаковый результат
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.tick = 0
+
         self.player_name = ""
         self.wave = 0
         self.score = 0
         self.money = 200
         self.lives = 20
         self.towers = []
-        self.enemies = []
         self.game_time = 0
         self.game_over = False
         self.screen_width = screen_width
@@ -178,68 +113,72 @@ class Game:
             (screen_width - 50, screen_height // 2)
         ]
 
+        # Путь компилируется один раз: враг на нем - это пройденное расстояние
+        self.path_table = PathTable(self.path)
+        # Враги на поле хранятся колонками NumPy, см. enemy_store.py
+        self.enemy_store = EnemyStore(self.path_table)
+        # Сетка для поиска врагов в радиусе взрыва
+        self.grid = SpatialGrid(screen_width, screen_height)
+        # Все снаряды всех башен в одном пуле слотов
+        self.projectile_pool = ProjectilePool()
+        # Маска допустимых мест и отпечатки башен: проверка установки и клика за O(1)
+        self.occupancy = Occupancy(screen_width, screen_height, self.path, PLACEMENT_MARGIN, PANEL_HEIGHT,
+                                   TOWER_SPACING)
+
         self.base_x = screen_width - 50
         self.base_y = screen_height // 2
 
-        self.wave_enemies = []  # Список врагов для текущей волны
+        self.wave_schedule = None  # Расписание спавна текущей волны, см. waves.py
         self.spawn_timer = 0  # Таймер для спавна
-        self.spawn_delay = 500  # Задержка между спавном врагов (мс)
-        self.enemies_per_spawn = 3  # Количество врагов за один спавн
-
-    def start_wave(self):
-        self.wave += 1
 
-        # Рассчитываем количество обычных врагов
-        base_enemies = 5
-        wave_multiplier = 1.5
-        enemy_count = int(base_enemies + self.wave * wave_multiplier)
-        enemy_count = max(5, min(enemy_count, 50))
+        # Пиковое число сущностей за текущую волну (для отчета о памяти)
+        self.peak_enemies = 0
+        self.peak_projectiles = 0
 
-        # Создаем обычных врагов
-        self.wave_enemies = []
-        for _ in range(enemy_count):
-            self.wave_enemies.append(Enemy(self.wave, self.path))
+        # Очередь событий симуляции, см. events.py
+        self.events = make_event_queue()
+        # Замер времени фаз тика (profiler.PhaseTimer) или None
+        self.profiler = None
 
-        # Каждую 5-ю волну добавляем босса В НАЧАЛО ВОЛНЫ
-        if self.wave % 5 == 0:
-            boss = Enemy(self.wave, self.path)
+    def start_wave(self):
+        self.wave += 1
 
-            # Усиливаем босса
-            boss.health = 500 + self.wave * 50
-            boss.max_health = boss.health
-            boss.reward = 100 + self.wave * 20
-            boss.speed = 0.5
-            boss.color = (255, 215, 0)  # Золотой
-            boss.type = 'boss'
+        # Враги появятся по расписанию, создавать их заранее не нужно
+        self.wave_schedule = WaveSchedule(self.wave, self.rng)
 
-            # Добавляем босса в начало списка (появится первым)
-            self.wave_enemies.insert(0, boss)
+        self.peak_enemies = 0
+        self.peak_projectiles = 0
 
         # Сбрасываем таймер спавна
         self.spawn_timer = 0
-        self.spawn_delay = max(200, 1000 - self.wave * 20)
-        self.enemies_per_spawn = min(5, 2 + self.wave // 3)
 
         # Бонус за волну
         wave_bonus = 50 + self.wave * 10
         self.money += wave_bonus
         self.score += 100
 
-    def place_tower(self, x, y):
-        if self.money < 50:
-            return False, "Недостаточно денег! Нужно 50 монет."
+        self.events.append(WaveStarted(self.tick, self.wave, self.wave_schedule.total, self.money))
 
-        if x < 100 or x > self.screen_width - 100 or y < 100 or y > self.screen_height - 100:
-            return False, "Ставьте башни в центре карты!"
+    def place_tower(self, x, y):
+        if self.money < TOWER_COST:
+            return False, f"Недостаточно денег! Нужно {TOWER_COST} монет."
 
-        for tower in self.towers:
-            if math.sqrt((x - tower.x) ** 2 + (y - tower.y) ** 2) < 40:
-                return False, "Слишком близко к другой башне!"
+        success, msg = self.can_place(x, y)
+        if not success:
+            return False, msg
 
-        self.towers.append(Tower(x, y))
-        self.money -= 50
+        self.add_tower(Tower(x, y))
+        self.money -= TOWER_COST
         return True, f"Башня установлена в позиции ({int(x)}, {int(y)})!"
 
+    def can_place(self, x, y):
+        # Можно ли поставить башню в точку (без учета денег); координаты округляются до пикселя
+        return check_placement(self.occupancy, x, y)
+
+    def add_tower(self, tower):
+        self.occupancy.add(len(self.towers), tower.x, tower.y)
+        self.towers.append(tower)
+
     def upgrade_tower(self, tower_index):
         if tower_index < 0 or tower_index >= len(self.towers):
             return False, "Неверный индекс башни!"
@@ -252,93 +191,259 @@ class Game:
         tower.upgrade()
         return True, f"Башня улучшена до уровня {tower.level}!"
 
+    def cycle_target_mode(self, tower_index):
+        if tower_index < 0 or tower_index >= len(self.towers):
+            return False, "Неверный индекс башни!"
+
+        tower = self.towers[tower_index]
+        position = TARGET_MODES.index(tower.target_mode)
+        tower.target_mode = TARGET_MODES[(position + 1) % len(TARGET_MODES)]
+        return True, f"Цель башни: {TARGET_MODE_NAMES[tower.target_mode]}"
+
+    def find_target(self, tower, order_key):
+        # Строка врага-цели для башни или -1. Враги упорядочены по progress,
+        # поэтому кандидаты - несколько непрерывных диапазонов строк
+        store = self.enemy_store
+        if tower.path_intervals is None:
+            tower.path_intervals = self.path_table.intervals_within(tower.x, tower.y, tower.range)
+        ranges = store.ranges_within(tower.path_intervals, order_key)
+        if not ranges:
+            return -1
+
+        if tower.target_mode == 'first':
+            return min(lo for lo, _ in ranges)
+        if tower.target_mode == 'last':
+            return max(hi for _, hi in ranges) - 1
+
+        rows = np.concatenate([np.arange(lo, hi) for lo, hi in ranges])
+        if tower.target_mode == 'strongest':
+            return int(rows[np.argmax(store.health[rows])])
+        dx = store.x[rows] - tower.x
+        dy = store.y[rows] - tower.y
+        return int(rows[np.argmin(dx * dx + dy * dy)])
+
+    @property
+    def pending_enemies(self):
+        # Сколько врагов текущей волны еще не появилось
+        return self.wave_schedule.remaining if self.wave_schedule is not None else 0
+
+    def drain_events(self):
+        # Забирает накопленные события (по порядку) и очищает очередь
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    @property
+    def enemies(self):
+        # Враги на поле в виде объектов с интерфейсом Enemy (для отрисовки)
+        return self.enemy_store.views()
+
+    @property
+    def projectiles(self):
+        # Летящие снаряды для отрисовки
+        return self.projectile_pool.views()
+
     def update(self, delta_time):
+        # Один тик симуляции. Фазы вынесены в отдельные методы; если задан
+        # self.profiler (profiler.PhaseTimer), время каждой фазы замеряется
         if self.game_over:
             return
-         # Отладочная информация о боссе
-        for enemy in self.enemies:
-            if enemy.type == 'boss':
-                 print(f"Босс на поле! Здоровье: {enemy.health}/{enemy.max_health}")
-
+        timer = self.profiler
+        if timer is not None:
+            timer.start()
+        store = self.enemy_store
         self.game_time += delta_time
 
-        # Спавн врагов из текущей волны
-        if self.wave_enemies:
-            self.spawn_timer += delta_time
-            if self.spawn_timer >= self.spawn_delay:
-                self.spawn_timer = 0
-
-                # Спавним группу врагов
-                spawn_count = min(self.enemies_per_spawn, len(self.wave_enemies))
-                for _ in range(spawn_count):
-                    if self.wave_enemies:
-                        enemy = self.wave_enemies.pop(0)
-                        self.enemies.append(enemy)
+        self._spawn_enemies(delta_time)
+        if timer is not None:
+            timer.mark('spawn')
 
         # Перемещаем обновление врагов перед стрельбой башен
-        enemies_to_remove = []
-        for enemy in self.enemies:
-            if not enemy.move():
-                self.lives -= 1
-                enemies_to_remove.append(enemy)
-            else:
-                if enemy.hit_effect > 0:
-                    enemy.hit_effect -= 1
-
-            if not enemy.alive:
-                enemies_to_remove.append(enemy)
-
-        # Удаляем врагов, которые достигли базы или умерли
-        for enemy in enemies_to_remove:
-            if enemy in self.enemies:
-                self.enemies.remove(enemy)
+        leaked = self._move_enemies()
+        if timer is not None:
+            timer.mark('move')
 
         # Проверяем конец игры
         if self.lives <= 0:
             self.game_over = True
+            store.compact()
+            if timer is not None:
+                timer.mark('compact')
+                timer.end_frame()
             return
 
+        order_key = self._index_enemies(leaked)
+        if timer is not None:
+            timer.mark('index')
+
         # Стрельба башен (ПЕРЕМЕЩЕНА ПОСЛЕ ОБНОВЛЕНИЯ ВРАГОВ)
-        for tower in self.towers:
-            if tower.can_shoot(self.game_time):
-                target = None
-                min_distance = tower.range + 1
-
-                for enemy in self.enemies:
-                    distance = tower.distance_to(enemy)
-                    if distance <= tower.range and distance < min_distance:
-                        target = enemy
-                        min_distance = distance
-
-                if target:
-                    tower.projectiles.append(
-                        Projectile(tower.x, tower.y, target.x, target.y, tower.damage)
-                    )
-                    tower.last_shot = self.game_time
+        self._fire_towers(order_key)
+        if timer is not None:
+            timer.mark('targeting')
+
+        if store.count > self.peak_enemies:
+            self.peak_enemies = store.count
+        if self.projectile_pool.active_count > self.peak_projectiles:
+            self.peak_projectiles = self.projectile_pool.active_count
 
         # Обновляем снаряды и наносим урон
-        for tower in self.towers:
-            hits = tower.update_projectiles()
-            for hit in hits:
-                damage = hit['damage']
-                hit_x = hit['target_x']
-                hit_y = hit['target_y']
-
-                # Ищем всех врагов в радиусе 50 пикселей
-                hit_enemies = []
-                for enemy in self.enemies:
-                    dist = math.sqrt((hit_x - enemy.x) ** 2 + (hit_y - enemy.y) ** 2)
-                    if dist < 50:
-                        hit_enemies.append(enemy)
-
-                # Наносим урон всем найденным врагам
-                for enemy in hit_enemies:
-                    if enemy.alive:
-                        reward = enemy.take_damage(damage)
-                        if reward > 0:
-                            self.money += reward
-                            self.score += reward
+        hits = self.projectile_pool.update()
+        if timer is not None:
+            timer.mark('projectiles')
+        self._apply_hits(hits)
+        if timer is not None:
+            timer.mark('splash')
+
+        # Один проход компактизации за тик: убитые взрывами в этом тике
+        # и дошедшие до базы удаляются сразу
+        store.compact()
 
         # Если волна закончилась (все враги созданы и все побеждены)
-        if not self.wave_enemies and not self.enemies:
-            self.start_wave()
\ No newline at end of file
+        if not self.pending_enemies and not store.count:
+            self.events.append(WaveEnded(self.tick, self.wave))
+            self.start_wave()
+        if timer is not None:
+            timer.mark('compact')
+            timer.end_frame()
+
+    def _spawn_enemies(self, delta_time):
+        # Спавн врагов из текущей волны
+        schedule = self.wave_schedule
+        if self.pending_enemies:
+            self.spawn_timer += delta_time
+            if self.spawn_timer >= schedule.spawn_delay:
+                self.spawn_timer = 0
+
+                # Спавним группу врагов
+                kinds = schedule.next_group()
+                self.enemy_store.spawn(kinds, schedule.speed, schedule.health, schedule.reward)
+                for kind in kinds.tolist():
+                    self.events.append(EnemySpawned(self.tick, kind))
+
+    def _move_enemies(self):
+        # Движение и затухание эффекта попадания - векторно.
+        # Возвращает маску дошедших до базы или None, если поле пустое
+        store = self.enemy_store
+        if not store.count:
+            return None
+        leaked = store.move()
+        leaked_rows = np.flatnonzero(leaked)
+        if len(leaked_rows):
+            # Дошедшие до базы выбывают сразу, из колонок их уберет compact() в конце тика
+            self.lives -= len(leaked_rows)
+            store.alive[leaked_rows] = False
+            for kind in store.kind[leaked_rows].tolist():
+                self.events.append(EnemyLeaked(self.tick, kind))
+        return leaked
+
+    def _index_enemies(self, leaked):
+        # До конца тика враги не двигаются, поэтому сетка строится один раз.
+        # Возвращает ключ поиска целей для find_target
+        store = self.enemy_store
+        self.grid.rebuild(store.x[:store.count], store.y[:store.count])
+        order_key = -store.progress[:store.count]
+        if leaked is not None:
+            # Дошедшие до базы лежат в начале; -inf не попадет ни в один участок пути
+            order_key[leaked] = -np.inf
+        return order_key
+
+    def _fire_towers(self, order_key):
+        store = self.enemy_store
+        for index, tower in enumerate(self.towers):
+            if tower.can_shoot(self.game_time) and store.count:
+                target = self.find_target(tower, order_key)
+
+                if target >= 0:
+                    self.projectile_pool.spawn(tower.x, tower.y, float(store.x[target]), float(store.y[target]),
+                                               tower.damage, index)
+                    tower.last_shot = self.game_time
+
+    def _apply_hits(self, hits):
+        store = self.enemy_store
+        for damage, hit_x, hit_y, tower in hits.tolist():
+            # Наносим урон всем живым врагам в радиусе взрыва
+            hit_rows, killed = store.damage(self.grid.within(hit_x, hit_y, SPLASH_RADIUS), damage)
+            self.events.append(EnemyHit(self.tick, tower, damage, hit_x, hit_y, len(hit_rows)))
+            if len(killed):
+                rewards = store.reward[killed].tolist()
+                self.money += sum(rewards)
+                self.score += sum(rewards)
+                for kind, reward, x, y in zip(store.kind[killed].tolist(), rewards,
+                                              store.x[killed].tolist(), store.y[killed].tolist()):
+                    self.events.append(EnemyKilled(self.tick, kind, reward, tower, x, y))
+
+    def memory_report(self):
+        # Сколько памяти занимают сущности: на штуку, сейчас и на пике текущей волны
+        store = self.enemy_store
+        pool = self.projectile_pool
+        per_entity = {
+            'tower': sys.getsizeof(self.towers[0]) if self.towers else sys.getsizeof(Tower(0, 0)),
+            'enemy': store.row_bytes(),
+            'projectile': pool.slot_bytes(),
+        }
+        counts = {
+            'towers': len(self.towers),
+            'enemies': store.count,
+            'projectiles': pool.active_count,
+            'pending_enemies': self.pending_enemies,
+        }
+        allocated = {
+            'towers': counts['towers'] * per_entity['tower'],
+            'enemies': store.capacity * per_entity['enemy'],
+            'projectiles': pool.capacity * per_entity['projectile'],
+            # Ожидающие враги - это только расписание волны, его размер не зависит от их числа
+            'wave_schedule': (sys.getsizeof(self.wave_schedule) + self.wave_schedule.nbytes()
+                              if self.wave_schedule is not None else 0),
+        }
+        peak_bytes = (self.peak_enemies * per_entity['enemy']
+                      + self.peak_projectiles * per_entity['projectile']
+                      + allocated['towers'])
+        return {
+            'bytes_per_entity': per_entity,
+            'counts': counts,
+            'allocated_bytes': allocated,
+            'total_allocated_bytes': sum(allocated.values()),
+            'wave_peak': {
+                'wave': self.wave,
+                'enemies': self.peak_enemies,
+                'projectiles': self.peak_projectiles,
+                'bytes': peak_bytes,
+            },
+        }
+
+    def set_profiler(self, profiler):
+        # Включает (profiler.PhaseTimer) или выключает (None) замеры тика.
+        # В main.py приходит командой в поток симуляции, как и profile_report
+        self.profiler = profiler
+
+    def profile_report(self):
+        # Замеры тика и память для файла профиля (F4)
+        return {
+            'wave': self.wave,
+            'tick': self.tick,
+            'sim': self.profiler.stats() if self.profiler is not None else {},
+            'memory': self.memory_report(),
+        }
+
+    def step(self, n_ticks=1):
+        # Продвигает симуляцию на n_ticks тиков фиксированной длины без pygame.
+        # Возвращает количество реально выполненных тиков
+        done = 0
+        while done < n_ticks and not self.game_over:
+            self.update(TICK_MS)
+            self.tick += 1
+            done += 1
+        return done
+
+    def run_until(self, wave=None, max_ticks=None):
+        # Крутит симуляцию, пока не начнется волна wave, не закончится игра
+        # или не истечет max_ticks. Возвращает True, если волна достигнута
+        ticks = 0
+        while not self.game_over:
+            if wave is not None and self.wave >= wave:
+                return True
+            if max_ticks is not None and ticks >= max_ticks:
+                break
+            self.step()
+            ticks += 1
+        return wave is not None and self.wave >= wave
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import bisect
+import datetime
+import heapq
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from records_schema import DB_PATH, TOP_CACHE_SIZE, INSERT_RECORDS, migrate, select_records_page
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Новые записи копятся столько секунд (или до BATCH_SIZE штук) и пишутся одной транзакцией
+BATCH_DELAY = 0.05
+BATCH_SIZE = 256
+# Предел длины строки запроса
+MAX_LINE = 64 * 1024
+
+
+class Leaderboard:
+    # Таблица лидеров в памяти: куча TOP_CACHE_SIZE лучших записей и
+    # отсортированные ключи всех записей для подсчета места. Топ и место
+    # отдаются без запросов к БД; новые записи пишутся в SQLite пачками
+    def __init__(self, path, size=TOP_CACHE_SIZE, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY):
+        self.path = path
+        self.size = size
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        # Куча (score, wave, -порядковый номер, запись): в корне худшая запись топа.
+        # Среди равных лучше более ранняя запись, как в БД (меньший id)
+        self.heap = []
+        self.top = None
+        # (-score, -wave) всех записей по возрастанию
+        self.keys = []
+        self.sessions = set()
+        self.last_id = 0
+        self.pending = []
+        self.saved = 0
+        self.batches = 0
+        # Все обращения к SQLite - в одном отдельном потоке, цикл событий не блокируется
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="leaderboard-db")
+        self.conn = None
+        self.write_lock = None
+        self.wakeup = None
+        # Открытые соединения (задача, writer), чтобы закрыть их при остановке
+        self.clients = {}
+
+    async def open(self):
+        self.write_lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        await self._db(self._load)
+
+    def _load(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        migrate(self.conn)
+        self.sessions = {row[0] for row in self.conn.execute(
+            'SELECT session_id FROM records WHERE session_id IS NOT NULL')}
+        self.keys = sorted((-score, -wave) for score, wave in self.conn.execute('SELECT score, wave FROM records'))
+        self.last_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM records').fetchone()[0]
+        self.heap = [(score, wave, -record_id, (player_name, wave, score, timestamp))
+                     for record_id, player_name, wave, score, timestamp in self.conn.execute('''
+                         SELECT id, player_name, wave, score, timestamp
+                         FROM records
+                         ORDER BY score DESC, wave DESC, id
+                         LIMIT ?
+                     ''', (self.size,))]
+        heapq.heapify(self.heap)
+        self.top = None
+
+    async def _db(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def add(self, session_id, player_name, wave, score, timestamp=None):
+        # (сохранено ли, место). Повторная сессия не сохраняется.
+        # timestamp - время записи у клиента, без него берется время сервера
+        if session_id in self.sessions:
+            return False, None
+        self.sessions.add(session_id)
+        if timestamp is None:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        key = (-score, -wave)
+        # Среди равных новая запись идет последней
+        rank = bisect.bisect_right(self.keys, key) + 1
+        self.keys.insert(rank - 1, key)
+
+        self.last_id += 1
+        item = (score, wave, -self.last_id, (player_name, wave, score, timestamp))
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, item)
+            self.top = None
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+            self.top = None
+
+        self.pending.append((player_name, wave, score, timestamp, session_id))
+        self.wakeup.set()
+        return True, rank
+
+    def rank(self, score, wave):
+        return bisect.bisect_left(self.keys, (-score, -wave)) + 1
+
+    async def top_records(self, limit):
+        if limit <= self.size or len(self.keys) <= self.size:
+            if self.top is None:
+                self.top = [item[3] for item in sorted(self.heap, reverse=True)]
+            return self.top[:limit]
+        # Глубже кучи - из БД
+        await self.flush()
+        return (await self.page(None, limit))[0]
+
+    async def page(self, after, limit):
+        await self.flush()
+        return await self._db(select_records_page, self.conn, after, limit)
+
+    async def flush(self):
+        # Пишет все накопленные записи одной транзакцией
+        async with self.write_lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            try:
+                await self._db(self._write, batch)
+            except sqlite3.Error as e:
+                # Записи остаются в памяти и уйдут со следующей пачкой
+                print(f"Ошибка сохранения рекордов: {e}")
+                self.pending[:0] = batch
+                return
+            self.saved += len(batch)
+            self.batches += 1
+
+    def _write(self, batch):
+        with self.conn:
+            self.conn.executemany(INSERT_RECORDS, batch)
+
+    async def run_writer(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            if len(self.pending) < self.batch_size:
+                await asyncio.sleep(self.batch_delay)
+            await self.flush()
+
+    async def close(self):
+        await self.flush()
+        if self.conn is not None:
+            await self._db(self.conn.close)
+            self.conn = None
+        self.executor.shutdown()
+
+    async def handle(self, request):
+        op = request['op']
+        if op == 'save':
+            if 'records' in request:
+                # Пачка записей [player_name, wave, score, timestamp, session_id] (RecordWriter)
+                results = [self.add(str(session_id), str(player_name), int(wave), int(score), str(timestamp))
+                           for player_name, wave, score, timestamp, session_id in request['records']]
+                return {'saved': [saved for saved, _ in results], 'ranks': [rank for _, rank in results]}
+            saved, rank = self.add(str(request['session_id']), str(request['player_name']),
+                                   int(request['wave']), int(request['score']))
+            return {'saved': saved, 'rank': rank}
+        if op == 'top':
+            return {'records': await self.top_records(int(request.get('limit', 10)))}
+        if op == 'rank':
+            return {'rank': self.rank(int(request['score']), int(request['wave']))}
+        if op == 'page':
+            after = request.get('after')
+            records, next_cursor = await self.page(tuple(after) if after is not None else None,
+                                                   int(request.get('limit', 10)))
+            return {'records': records, 'next': next_cursor}
+        if op == 'flush':
+            await self.flush()
+            return {}
+        if op == 'stats':
+            return {'records': len(self.keys), 'pending': len(self.pending), 'saved': self.saved,
+                    'batches': self.batches}
+        raise ValueError(f"неизвестная команда {op!r}")
+
+    async def serve_client(self, reader, writer):
+        # Соединение живет, пока клиент его не закроет: одна строка JSON - один запрос
+        task = asyncio.current_task()
+        self.clients[task] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle(json.loads(line))
+                    response['ok'] = True
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # Обрыв или слишком длинная строка: соединение закрывается
+            pass
+        finally:
+            self.clients.pop(task, None)
+            writer.close()
+
+    async def close_clients(self):
+        # Закрытый транспорт дает обработчику конец потока, и он завершается сам
+        tasks = list(self.clients)
+        for writer in self.clients.values():
+            writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def redirect_output(path):
+    # Весь дальнейший вывод процесса (и print, и дочерних библиотек) - в файл path
+    sys.stdout.flush()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+    try:
+        os.dup2(fd, sys.stdout.fileno())
+    finally:
+        os.close(fd)
+
+
+async def serve(path=DB_PATH, host=DEFAULT_HOST, port=DEFAULT_PORT, size=TOP_CACHE_SIZE, log=None):
+    leaderboard = Leaderboard(path, size)
+    await leaderboard.open()
+    server = await asyncio.start_server(leaderboard.serve_client, host, port, limit=MAX_LINE)
+    host, port = server.sockets[0].getsockname()[:2]
+    # Строку читает spawn: по ней видно, что сервер готов и какой порт он занял
+    print(f"Таблица лидеров: {len(leaderboard.keys)} записей, адрес {host}:{port}", flush=True)
+    if log is not None:
+        # Канал к spawn больше никто не читает: заполнившись, он остановил бы сервер на print
+        redirect_output(log)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: остановка по Ctrl+C через KeyboardInterrupt
+            pass
+    writer = asyncio.create_task(leaderboard.run_writer())
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await leaderboard.close_clients()
+        await server.wait_closed()
+        writer.cancel()
+        await leaderboard.close()
+
+
+def spawn(path=DB_PATH, host=DEFAULT_HOST, port=0, log=os.devnull):
+    # Запуск сервера подпроцессом. Возвращает (процесс, 'host:port') или None.
+    # При port=0 порт выбирает система. После строки готовности вывод сервера идет в log
+    process = subprocess.Popen([sys.executable, __file__, '--db', path, '--host', host, '--port', str(port),
+                                '--log', log],
+                               stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    line = process.stdout.readline()
+    process.stdout.close()
+    if not line:
+        process.wait()
+        print(f"Сервер таблицы лидеров не запустился (код {process.returncode})")
+        return None
+    return process, line.split()[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Общая таблица лидеров для нескольких игр")
+    parser.add_argument('--db', default=DB_PATH, help="файл SQLite с рекордами")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="0 - любой свободный")
+    parser.add_argument('--top', type=int, default=TOP_CACHE_SIZE, help="лучших записей в памяти")
+    parser.add_argument('--log', help="файл для вывода после запуска (по умолчанию - консоль)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.top, args.log))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Не удалось запустить сервер: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,26 @@
 import pygame
 import sys
-import math
-from database import save_record, get_top_records
-from game_logic import Game, Tower, Enemy, Projectile
+import random
+import struct
+from database import (save_record, get_records_page, new_session_id, save_snapshot, get_snapshot_info,
+                      load_snapshot, delete_snapshot, finish_snapshots)
+from render_cache import TextCache, DirtyRegions
+from events import EnemySpawned, WaveStarted
+from replay import open_recorder
+import snapshot
+from profiler import PhaseTimer, HISTOGRAM_EDGES, dump_profile
+from telemetry import open_telemetry
+from sim_thread import SimulationThread
+from placement import coverage_map
+from entity_types import BOSS_KIND
+from game_logic import (Game, Tower, SCREEN_WIDTH, SCREEN_HEIGHT, PANEL_HEIGHT, TARGET_MODE_NAMES,
+                        check_placement)
 
 # Инициализация Pygame
 pygame.init()
 pygame.font.init()
 
 # Настройки окна
-SCREEN_WIDTH = 1000
-SCREEN_HEIGHT = 700
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Tower Defence")
 
@@ -31,6 +41,9 @@ font_small = pygame.font.SysFont(None, 28)
 font_medium = pygame.font.SysFont(None, 36)
 font_large = pygame.font.SysFont(None, 48)
 
+# Кэш отрисованного текста, общий для всех экранов
+text_cache = TextCache()
+
 
 # Кнопка
 class Button:
@@ -46,7 +59,7 @@ class Button:
         pygame.draw.rect(surface, color, self.rect, border_radius=8)
         pygame.draw.rect(surface, WHITE, self.rect, 2, border_radius=8)
 
-        text_surf = font_medium.render(self.text, True, WHITE)
+        text_surf = text_cache.render(font_medium, self.text, WHITE)
         text_rect = text_surf.get_rect(center=self.rect.center)
         surface.blit(text_surf, text_rect)
 
@@ -65,7 +78,7 @@ class InputBox:
         self.rect = pygame.Rect(x, y, w, h)
         self.color = BLUE
         self.text = text
-        self.txt_surface = font_medium.render(text, True, WHITE)
+        self.txt_surface = text_cache.render(font_medium, text, WHITE)
         self.active = False
 
     def handle_event(self, event):
@@ -80,7 +93,7 @@ class InputBox:
                     self.text = self.text[:-1]
                 else:
                     self.text += event.unicode
-                self.txt_surface = font_medium.render(self.text, True, WHITE)
+                self.txt_surface = text_cache.render(font_medium, self.text, WHITE)
         return None
 
     def draw(self, screen):
@@ -89,390 +102,870 @@ class InputBox:
         pygame.draw.rect(screen, WHITE, self.rect, 2, border_radius=5)
 
 
-# Инициализация игры
-game = Game(SCREEN_WIDTH, SCREEN_HEIGHT)
-
 # Создание кнопок
 tower_button = Button(20, 20, 200, 50, "Поставить башню (50$)", BLUE, (30, 100, 200))
 upgrade_button = Button(20, 90, 200, 50, "Улучшить башню", GREEN, (30, 180, 30))
 menu_button = Button(20, 160, 200, 50, "Главное меню", GRAY, (80, 80, 80))
 
 
+# Базовый экран (сцена)
+class Scene:
+    # Бюджет кадров: None - статичная сцена, которая спит до следующего события
+    # и перерисовывается только когда что-то изменилось; число - FPS для анимации
+    frame_budget = None
+    # Замер времени фаз кадра (profiler.PhaseTimer) или None
+    profiler = None
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.dirty = True
+
+    def enter(self, **kwargs):
+        self.dirty = True
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, delta_time):
+        pass
+
+    def draw(self, surface):
+        pass
+
+    def close(self):
+        # Вызывается при закрытии окна
+        pass
+
+    def update_hover(self, buttons, pos):
+        # Наведение меняет вид кнопок - тогда сцену нужно перерисовать
+        for button in buttons:
+            hovered = button.rect.collidepoint(pos)
+            if hovered != button.is_hovered:
+                button.is_hovered = hovered
+                self.dirty = True
+
+
+# Сколько кадров подряд могут завершиться исключением, прежде чем игра закроется
+MAX_FRAME_ERRORS = 30
+
+
+# Менеджер сцен: общие часы, единая раздача событий и переключение экранов
+class SceneManager:
+    def __init__(self, surface):
+        self.surface = surface
+        self.clock = pygame.time.Clock()
+        self.scenes = {}
+        self.current = None
+        self.current_name = None
+        self.pending = None
+        # Исключения кадров пишутся в telemetry/app.jsonl, а не в консоль
+        self.telemetry = open_telemetry('app')
+        self.frame = 0
+        self.frame_errors = 0
+
+    def add(self, name, scene):
+        self.scenes[name] = scene
+
+    def switch(self, name, **kwargs):
+        # Переход выполняется в начале следующего кадра
+        self.pending = (name, kwargs)
+
+    def quit(self, code=0):
+        if self.current is not None:
+            self.current.close()
+        self.telemetry.close(self.frame, summary=False)
+        pygame.quit()
+        sys.exit(code)
+
+    def run(self, start):
+        self.switch(start)
+        while True:
+            try:
+                if self.pending is not None:
+                    name, kwargs = self.pending
+                    self.pending = None
+                    self.current = self.scenes[name]
+                    self.current_name = name
+                    self.current.enter(**kwargs)
+                    self.clock.tick()
+                scene = self.current
+
+                if scene.frame_budget is None:
+                    # Статичная сцена не тратит процессор: ждем событие и забираем остальные
+                    events = [pygame.event.wait()] + pygame.event.get()
+                    delta_time = self.clock.tick()
+                else:
+                    events = pygame.event.get()
+                    delta_time = self.clock.tick(scene.frame_budget)
+
+                # Время ожидания кадра не считается, только работа
+                profiler = scene.profiler
+                if profiler is not None:
+                    profiler.start()
+
+                for event in events:
+                    if event.type == pygame.QUIT:
+                        self.quit()
+                    if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                        scene.dirty = True
+                    scene.handle_event(event)
+                    if self.pending is not None:
+                        break
+
+                if self.pending is not None:
+                    continue
+                if profiler is not None:
+                    profiler.mark('events')
+                scene.update(delta_time)
+                if profiler is not None:
+                    profiler.mark('update')
+                if scene.frame_budget is not None or scene.dirty:
+                    # Этапы отрисовки сцена отмечает сама
+                    scene.draw(self.surface)
+                    scene.dirty = False
+                if profiler is not None:
+                    profiler.end_frame()
+                self.frame_errors = 0
+
+            except Exception as e:
+                # Повторяющиеся ошибки ограничены по частоте, игра закрывается,
+                # только если кадры падают много раз подряд
+                self.telemetry.error(self.frame, e, scene=self.current_name)
+                self.frame_errors += 1
+                if self.frame_errors >= MAX_FRAME_ERRORS:
+                    print(f"Ошибка: {e}", file=sys.stderr)
+                    self.quit(1)
+            self.frame += 1
+
+
 # Главное меню
-def main_menu():
-    # Кнопки меню
-    start_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2, 200, 60, "Начать игру", BLUE, (30, 100, 200))
-    records_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 + 80, 200, 60, "Рекорды", GREEN, (30, 180, 30))
-    quit_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 + 160, 200, 60, "Выход", RED, (180, 30, 30))
+class MenuScene(Scene):
+    def __init__(self, manager):
+        super().__init__(manager)
+        # Кнопки меню; "Продолжить" видна, только если есть прерванная партия
+        self.continue_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 - 80, 200, 60, "Продолжить", ORANGE, (200, 120, 0))
+        self.start_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2, 200, 60, "Начать игру", BLUE, (30, 100, 200))
+        self.records_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 + 80, 200, 60, "Рекорды", GREEN, (30, 180, 30))
+        self.quit_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 + 160, 200, 60, "Выход", RED, (180, 30, 30))
+        self.buttons = [self.start_button, self.records_button, self.quit_button]
+        self.snapshot_info = None
+
+    def enter(self, **kwargs):
+        super().enter()
+        self.snapshot_info = get_snapshot_info()
+        self.buttons = [self.start_button, self.records_button, self.quit_button]
+        if self.snapshot_info is not None:
+            self.buttons.insert(0, self.continue_button)
+        self.update_hover(self.buttons, pygame.mouse.get_pos())
 
-    while True:
-        mouse_pos = pygame.mouse.get_pos()
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEMOTION:
+            self.update_hover(self.buttons, event.pos)
+
+        if event.type != pygame.MOUSEBUTTONDOWN:
+            return
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+        if self.snapshot_info is not None and self.continue_button.is_clicked(event.pos, event):
+            self.manager.switch("game", resume=self.snapshot_info[0])
 
-            if start_button.is_clicked(mouse_pos, event):
-                return "name_input"
+        elif self.start_button.is_clicked(event.pos, event):
+            self.manager.switch("name_input")
 
-            if records_button.is_clicked(mouse_pos, event):
-                return "records"
+        elif self.records_button.is_clicked(event.pos, event):
+            self.manager.switch("records")
 
-            if quit_button.is_clicked(mouse_pos, event):
-                pygame.quit()
-                sys.exit()
+        elif self.quit_button.is_clicked(event.pos, event):
+            self.manager.quit()
 
+    def draw(self, surface):
         # Отрисовка меню
-        screen.fill(BACKGROUND)
+        surface.fill(BACKGROUND)
 
         # Заголовок
-        title = font_large.render("TOWER DEFENCE", True, YELLOW)
-        screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 100))
+        title = text_cache.render(font_large, "TOWER DEFENCE", YELLOW)
+        surface.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 100))
 
         # Кнопки
-        start_button.check_hover(mouse_pos)
-        records_button.check_hover(mouse_pos)
-        quit_button.check_hover(mouse_pos)
-
-        start_button.draw(screen)
-        records_button.draw(screen)
-        quit_button.draw(screen)
+        for button in self.buttons:
+            button.draw(surface)
 
         pygame.display.flip()
 
 
 # Экран ввода имени
-def name_input_screen():
-    input_box = InputBox(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2, 300, 50)
-    start_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 + 80, 200, 50, "Начать игру", BLUE,
-                          (30, 100, 200))
-
-    name = ""
-
-    while True:
-        mouse_pos = pygame.mouse.get_pos()
+class NameInputScene(Scene):
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.start_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 + 80, 200, 50, "Начать игру", BLUE,
+                                   (30, 100, 200))
+        self.input_box = None
+        self.name = ""
+
+    def enter(self, **kwargs):
+        super().enter()
+        self.input_box = InputBox(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2, 300, 50)
+        self.name = ""
+        self.update_hover([self.start_button], pygame.mouse.get_pos())
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEMOTION:
+            self.update_hover([self.start_button], event.pos)
 
-            result = input_box.handle_event(event)
+        if event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN):
+            result = self.input_box.handle_event(event)
             if result:
-                name = result
+                self.name = result
+            self.dirty = True
 
-            if start_button.is_clicked(mouse_pos, event):
-                return name or "Игрок"
+        if event.type == pygame.MOUSEBUTTONDOWN and self.start_button.is_clicked(event.pos, event):
+            self.manager.switch("game", player_name=self.name or "Игрок")
 
+    def draw(self, surface):
         # Отрисовка
-        screen.fill(BACKGROUND)
+        surface.fill(BACKGROUND)
 
         # Заголовок
-        title = font_large.render("ВВЕДИТЕ ВАШЕ ИМЯ", True, YELLOW)
-        screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 100))
+        title = text_cache.render(font_large, "ВВЕДИТЕ ВАШЕ ИМЯ", YELLOW)
+        surface.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 100))
 
         # Поле ввода
-        input_box.draw(screen)
-        start_button.check_hover(mouse_pos)
-        start_button.draw(screen)
+        self.input_box.draw(surface)
+        self.start_button.draw(surface)
 
         pygame.display.flip()
 
 
 # Экран рекордов
-def show_records():
-    records = get_top_records()
+class RecordsScene(Scene):
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.back_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT - 80, 200, 50, "Назад", GRAY, (80, 80, 80))
+        self.prev_button = Button(SCREEN_WIDTH // 2 - 220, SCREEN_HEIGHT - 80, 100, 50, "<", GRAY, (80, 80, 80))
+        self.next_button = Button(SCREEN_WIDTH // 2 + 120, SCREEN_HEIGHT - 80, 100, 50, ">", GRAY, (80, 80, 80))
+        self.buttons = [self.back_button, self.prev_button, self.next_button]
+        self.cursors = [None]
+        self.records = []
+        self.next_cursor = None
+
+    def enter(self, **kwargs):
+        super().enter()
+        # Постраничный просмотр: курсоры начала просмотренных страниц для кнопки "<"
+        self.cursors = [None]
+        self.records, self.next_cursor = get_records_page(None)
+        self.update_hover(self.buttons, pygame.mouse.get_pos())
 
-    back_button = Button(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT - 80, 200, 50, "Назад", GRAY, (80, 80, 80))
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEMOTION:
+            self.update_hover(self.buttons, event.pos)
 
-    while True:
-        mouse_pos = pygame.mouse.get_pos()
+        if event.type != pygame.MOUSEBUTTONDOWN:
+            return
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+        if self.back_button.is_clicked(event.pos, event):
+            self.manager.switch("menu")
 
-            if back_button.is_clicked(mouse_pos, event):
-                return
+        elif self.next_button.is_clicked(event.pos, event) and self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+            self.records, self.next_cursor = get_records_page(self.next_cursor)
+            self.dirty = True
 
+        elif self.prev_button.is_clicked(event.pos, event) and len(self.cursors) > 1:
+            self.cursors.pop()
+            self.records, self.next_cursor = get_records_page(self.cursors[-1])
+            self.dirty = True
+
+    def draw(self, surface):
         # Отрисовка
-        screen.fill(BACKGROUND)
+        surface.fill(BACKGROUND)
 
         # Заголовок
-        title = font_large.render("ТАБЛИЦА РЕКОРДОВ", True, YELLOW)
-        screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 50))
+        title = text_cache.render(font_large, "ТАБЛИЦА РЕКОРДОВ", YELLOW)
+        surface.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 50))
 
         # Заголовки таблицы
-        pygame.draw.rect(screen, (70, 70, 100), (50, 120, SCREEN_WIDTH - 100, 40))
+        pygame.draw.rect(surface, (70, 70, 100), (50, 120, SCREEN_WIDTH - 100, 40))
         texts = ["Игрок", "Волна", "Очки", "Дата"]
         for i, text in enumerate(texts):
             x = 100 + i * 220
-            header = font_medium.render(text, True, WHITE)
-            screen.blit(header, (x, 130))
+            header = text_cache.render(font_medium, text, WHITE)
+            surface.blit(header, (x, 130))
 
         # Список рекордов
-        if not records:
-            no_records = font_medium.render("Пока нет рекордов!", True, WHITE)
-            screen.blit(no_records, (SCREEN_WIDTH // 2 - no_records.get_width() // 2, 200))
+        if not self.records:
+            no_records = text_cache.render(font_medium, "Пока нет рекордов!", WHITE)
+            surface.blit(no_records, (SCREEN_WIDTH // 2 - no_records.get_width() // 2, 200))
         else:
-            for i, record in enumerate(records[:10]):
+            for i, record in enumerate(self.records[:10]):
                 name, wave, score, timestamp = record
                 date = timestamp.split()[0]
 
                 y = 180 + i * 40
                 bg_color = (50, 50, 80) if i % 2 == 0 else (60, 60, 90)
-                pygame.draw.rect(screen, bg_color, (50, y, SCREEN_WIDTH - 100, 35))
+                pygame.draw.rect(surface, bg_color, (50, y, SCREEN_WIDTH - 100, 35))
 
                 # Данные
-                screen.blit(font_small.render(name, True, WHITE), (100, y + 10))
-                screen.blit(font_small.render(str(wave), True, WHITE), (320, y + 10))
-                screen.blit(font_small.render(str(score), True, WHITE), (540, y + 10))
-                screen.blit(font_small.render(date, True, WHITE), (760, y + 10))
+                surface.blit(text_cache.render(font_small, name, WHITE), (100, y + 10))
+                surface.blit(text_cache.render(font_small, str(wave), WHITE), (320, y + 10))
+                surface.blit(text_cache.render(font_small, str(score), WHITE), (540, y + 10))
+                surface.blit(text_cache.render(font_small, date, WHITE), (760, y + 10))
 
         # Кнопка назад
-        back_button.check_hover(mouse_pos)
-        back_button.draw(screen)
+        self.back_button.draw(surface)
+
+        # Листание страниц
+        if len(self.cursors) > 1:
+            self.prev_button.draw(surface)
+        if self.next_cursor is not None:
+            self.next_button.draw(surface)
 
         pygame.display.flip()
 
 
+def build_static_layers(game):
+    # Неподвижные части игрового экрана: фон с путем и базой, фон панели и затемнение
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    background.fill(BACKGROUND)
+
+    # Рисуем путь
+    for i in range(len(game.path) - 1):
+        pygame.draw.line(background, GRAY, game.path[i], game.path[i + 1], 30)
+
+    # Рисуем базу
+    pygame.draw.circle(background, GREEN, (game.base_x, game.base_y), 30)
+    pygame.draw.circle(background, BLACK, (game.base_x, game.base_y), 30, 2)
+
+    # Фон панели информации вместе с линией под ней (линия - последние 2 пикселя панели)
+    panel = pygame.Surface((SCREEN_WIDTH, PANEL_HEIGHT)).convert()
+    panel.fill(BACKGROUND)
+    pygame.draw.rect(panel, (40, 40, 70), (0, 0, SCREEN_WIDTH, PANEL_HEIGHT - 2))
+    pygame.draw.line(panel, WHITE, (0, PANEL_HEIGHT - 2), (SCREEN_WIDTH, PANEL_HEIGHT - 2), 2)
+
+    overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    overlay.fill((0, 0, 0, 180))
+
+    # Подложка панели профилировщика (F3)
+    profiler_panel = pygame.Surface((380, 345), pygame.SRCALPHA)
+    profiler_panel.fill((0, 0, 0, 190))
+
+    return {'background': background, 'panel': panel, 'overlay': overlay, 'profiler': profiler_panel}
+
+
+def build_hint_layer(background, coverage, level=1):
+    # Фон с картой покрытия пути (H): чем ярче клетка, тем больше пути
+    # простреливает поставленная в нее башня уровня level; закрашены только допустимые клетки
+    layer = background.copy()
+    hint = pygame.Surface(layer.get_size(), pygame.SRCALPHA)
+    values = coverage.level_map(level)
+    top = values.max() or 1
+    half = coverage.step // 2
+    for row, y in enumerate(coverage.ys.tolist()):
+        for column, x in enumerate(coverage.xs.tolist()):
+            value = values[row, column]
+            if value > 0 and coverage.valid[row, column]:
+                hint.fill((50, 200, 50, int(20 + 120 * value / top)),
+                          (int(x) - half, int(y) - half, coverage.step, coverage.step))
+    layer.blit(hint, (0, 0))
+    return layer
+
+
+def draw_enemy(surface, enemy):
+    # Рисует врага и возвращает занятый им прямоугольник
+    x, y = int(enemy.x), int(enemy.y)
+    area = pygame.Rect(x - 18, y - 30, 36, 48)
+    if enemy.hit_effect > 0:
+        pygame.draw.circle(surface, (255, 100, 100), (x, y), 18)
+
+    pygame.draw.circle(surface, enemy.color, (x, y), 15)
+    pygame.draw.circle(surface, BLACK, (x, y), 15, 2)
+
+    # ПОЛОСКА ЗДОРОВЬЯ (ИСПРАВЛЕННЫЙ РАСЧЕТ)
+    health_percent = max(0, enemy.health / enemy.max_health)
+    health_width = int(30 * health_percent)  # Явное преобразование в int
+
+    # Фон полоски (красный)
+    pygame.draw.rect(surface, RED, (enemy.x - 15, enemy.y - 30, 30, 7))
+
+    # Зеленая часть (текущее здоровье)
+    health_color = GREEN
+    if enemy.hit_effect > 0:
+        health_color = YELLOW
+    pygame.draw.rect(surface, health_color, (enemy.x - 15, enemy.y - 30, health_width, 7))
+
+    # Контур
+    pygame.draw.rect(surface, BLACK, (enemy.x - 15, enemy.y - 30, 30, 7), 1)
+
+    # Текст здоровья
+    health_text = text_cache.render(font_small, f"{int(enemy.health)}/{int(enemy.max_health)}", WHITE)
+    area.union_ip(surface.blit(health_text, (enemy.x - health_text.get_width() // 2, enemy.y - 45)))
+
+    # Особый рендеринг для босса
+    if enemy.type == 'boss':
+        # Больший размер
+        area.union_ip(pygame.draw.circle(surface, enemy.color, (x, y), 25))
+        pygame.draw.circle(surface, BLACK, (x, y), 25, 2)
+
+        # Коронка над боссом
+        crown_points = [
+            (enemy.x - 20, enemy.y - 30),
+            (enemy.x, enemy.y - 50),
+            (enemy.x + 20, enemy.y - 30),
+            (enemy.x + 15, enemy.y - 40),
+            (enemy.x, enemy.y - 55),
+            (enemy.x - 15, enemy.y - 40)
+        ]
+        pygame.draw.polygon(surface, (255, 215, 0), crown_points)
+        area.union_ip(pygame.draw.polygon(surface, BLACK, crown_points, 2))
+
+        # Текст "BOSS"
+        boss_text = text_cache.render(font_small, "BOSS", BLACK)
+        area.union_ip(surface.blit(boss_text, (enemy.x - boss_text.get_width() // 2, enemy.y - 70)))
+    # Запас на сглаживание краев
+    return area.inflate(4, 4)
+
+
+def draw_projectile(surface, projectile):
+    area = pygame.draw.circle(surface, YELLOW, (int(projectile.x), int(projectile.y)), 5)
+    pygame.draw.circle(surface, ORANGE, (int(projectile.x), int(projectile.y)), 3)
+
+    if len(projectile.trail) > 1:
+        for i in range(1, len(projectile.trail)):
+            prev_pos = projectile.trail[i - 1]
+            curr_pos = projectile.trail[i]
+            area.union_ip(pygame.draw.line(surface, (255, 255, 0), prev_pos, curr_pos, 2))
+    return area.inflate(4, 4)
+
+
+def draw_tower(surface, tower, selected):
+    color = YELLOW if selected else BLUE
+    pygame.draw.circle(surface, color, (int(tower.x), int(tower.y)), 20)
+    pygame.draw.circle(surface, BLACK, (int(tower.x), int(tower.y)), 20, 2)
+
+    level_text = text_cache.render(font_small, f"{tower.level}", WHITE)
+    damage_text = text_cache.render(font_small, f"{tower.damage}", (255, 200, 0))
+    surface.blit(level_text, (tower.x - 5, tower.y - 8))
+    surface.blit(damage_text, (tower.x - 10, tower.y + 10))
+
+    if selected:
+        pygame.draw.circle(surface, (100, 100, 100, 100), (int(tower.x), int(tower.y)), tower.range, 1)
+
+
+def render_profiler(panel, ui, state, fps):
+    # Панель F3: гистограмма времени кадра, самые дорогие фазы и число сущностей.
+    # Перерисовывается несколько раз в секунду, в остальных кадрах просто копируется
+    surface = panel.copy()
+
+    def line(text, row, color=WHITE):
+        surface.blit(text_cache.render(font_small, text, color), (10, 8 + row * 22))
+
+    frame_ms = ui.stats()['frame_ms']
+    if frame_ms:
+        line(f"Кадр: {frame_ms['mean']:.2f} мс, p99 {frame_ms['p99']:.2f} мс, {fps:.0f} FPS", 0, YELLOW)
+
+    # Гистограмма: столбцы по корзинам HISTOGRAM_EDGES
+    counts = ui.histogram()
+    top = max(counts) or 1
+    bar_width = (surface.get_width() - 20) // len(counts)
+    for i, count in enumerate(counts):
+        height = int(60 * count / top)
+        pygame.draw.rect(surface, LIGHT_BLUE if i < 5 else ORANGE,
+                         (10 + i * bar_width, 90 - height, bar_width - 4, height))
+        label = "50+" if i == len(counts) - 1 else f"{HISTOGRAM_EDGES[i]:.0f}"
+        surface.blit(text_cache.render(font_small, label, GRAY), (10 + i * bar_width, 92))
+
+    line("Интерфейс, мс/кадр:", 5, YELLOW)
+    for row, (phase, value) in enumerate(list(ui.phase_means_ms().items())[:4]):
+        line(f"{phase}: {value:.3f}", 6 + row)
+    line("Симуляция, мкс/тик:", 10, YELLOW)
+    for row, (phase, value) in enumerate(list((state.sim_phases or {}).items())[:3]):
+        line(f"{phase}: {value * 1000:.1f}", 11 + row)
+
+    line(f"Враги {len(state.enemy_progress)}  Снаряды {len(state.projectile_x)}  "
+         f"Башни {len(state.towers)}  Ждут {state.pending_enemies}", 14, GREEN)
+    return surface
+
+
+# Команды игрока, которые интерфейс передает в поток симуляции: результат (успех, сообщение)
+PLAYER_COMMANDS = ('place_tower', 'upgrade_tower', 'cycle_target_mode')
+
+
+# Игровой экран
+class GameScene(Scene):
+    frame_budget = 60
+
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.game = None
+
+    def enter(self, player_name="Игрок", resume=None, **kwargs):
+        super().enter()
+        self.record_saved = False
+        self.recorder = None
+        self.game = None
+        if resume is not None:
+            # Продолжение прерванной партии из снимка
+            data = load_snapshot(resume)
+            try:
+                self.game = snapshot.decode(data) if data is not None else None
+            except (ValueError, struct.error) as e:
+                self.manager.telemetry.error(self.manager.frame, e, scene=self.manager.current_name, session=resume)
+            if self.game is not None:
+                self.session_id = resume
+                # Повтор дописывается в файл начала партии (см. replay.py)
+                if self.game.seed is not None:
+                    self.recorder = open_recorder(self.game.seed, SCREEN_WIDTH, SCREEN_HEIGHT, self.session_id,
+                                                  resume=True)
+                # Телеметрия продолжает ту же сессию: счетчики восстанавливаются из ее промежуточного итога
+                self.telemetry = open_telemetry(self.session_id)
+                self.telemetry.restore()
+                self.telemetry.wave = self.game.wave
+                self.telemetry.record('resume', self.game.tick, wave=self.game.wave)
+
+        if self.game is None:
+            # Прерванные партии, которые не продолжили, попадают в рекорды
+            finish_snapshots()
+            # Сброс игры. seed запоминается, чтобы партию можно было повторить
+            seed = random.randrange(2 ** 31)
+            self.game = Game(SCREEN_WIDTH, SCREEN_HEIGHT, seed=seed)
+            self.game.player_name = player_name
+            self.game.start_wave()
+            # Ключ сессии: результат этой партии запишется в таблицу рекордов ровно один раз
+            self.session_id = new_session_id()
+            # Повтор партии: seed и команды игрока, см. replay.py
+            self.recorder = open_recorder(seed, SCREEN_WIDTH, SCREEN_HEIGHT, self.session_id)
+            # Телеметрия партии: счетчики по башням и волнам, см. telemetry.py
+            self.telemetry = open_telemetry(self.session_id)
+
+        self.selected_tower = None
+
+        # Сообщения интерфейса
+        self.message = ""
+        self.message_timer = 0
+        if resume is not None and self.session_id != resume:
+            self.show_message("Не удалось продолжить партию, начата новая")
+        self.placing_mode = False
+        # F2 - показать статистику кэша текста
+        self.show_cache_stats = False
+        # H - подсказка: карта покрытия пути для выбора места башни
+        self.show_hint = False
+        # F3 - профилировщик кадра и симуляции с панелью, F4 - сохранить его статистику
+        self.profiler = None
+        self.profiler_panel = None
+
+        # Статические слои рисуются один раз, дальше обновляются только грязные области
+        self.layers = build_static_layers(self.game)
+        self.dirty_regions = DirtyRegions(screen.get_rect())
+        self.last_tower_state = None
+        self.last_hud_state = None
+        self.last_over_state = None
+
+        # Симуляция идет в своем потоке тиками фиксированной длины, независимо от FPS.
+        # Интерфейс рисует ее снимки и отправляет команды через очередь
+        self.sim = SimulationThread(self.game, on_tick=self.on_tick, on_command=self.on_command)
+        self.sim.start()
+
+    def on_tick(self, game, events):
+        # Поток симуляции: контрольные суммы повтора и телеметрия
+        if self.recorder is not None:
+            self.recorder.checkpoint(game)
+        self.telemetry.consume(events)
+        self.telemetry.sample(game)
+
+    def on_command(self, name, args, result):
+        # Поток симуляции: в повтор попадают только выполненные команды игрока с тиком их выполнения
+        if name not in PLAYER_COMMANDS or self.recorder is None:
+            return
+        success, _ = result
+        if not success:
+            return
+        tick = self.game.tick
+        if name == 'place_tower':
+            self.recorder.place(tick, *args)
+        elif name == 'upgrade_tower':
+            self.recorder.upgrade(tick, *args)
+        elif name == 'cycle_target_mode':
+            self.recorder.target(tick, *args)
+
+    def show_message(self, text, duration=2000):
+        self.message = text
+        self.message_timer = duration
+
+    def save_result(self):
+        if not self.record_saved:
+            save_record(self.game.player_name, self.game.wave, self.game.score, self.session_id)
+            delete_snapshot(self.session_id)
+            self.record_saved = True
+        if self.recorder is not None:
+            self.recorder.close(self.game)
+        self.telemetry.close(self.game.tick)
+
+    def suspend(self):
+        # Выход в меню посреди партии: состояние сохраняется, результат пока не записывается
+        self.sim.stop()
+        game = self.game
+        if game.game_over or not save_snapshot(self.session_id, game.player_name, game.wave, game.score,
+                                               snapshot.encode(game)):
+            self.save_result()
+        else:
+            if self.recorder is not None:
+                self.recorder.close(game, end=False)
+            self.telemetry.close(game.tick, suspended=True)
 
-def game_screen(player_name):
-    global game
+    def close(self):
+        # Закрытие окна посреди партии - как выход в меню: снимок, повтор без записи конца, итог телеметрии
+        if self.game is not None:
+            self.suspend()
 
-    # Сброс игры
-    game = Game(SCREEN_WIDTH, SCREEN_HEIGHT)
-    game.player_name = player_name
-    game.start_wave()
+    def handle_event(self, event):
+        # Game принадлежит потоку симуляции: состояние читается из снимка, команды идут в очередь
+        sim = self.sim
+        latest = sim.snapshots[1]
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F2:
+            self.show_cache_stats = not self.show_cache_stats
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.toggle_profiler()
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+            self.toggle_hint()
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+            self.dump_profile()
+        # T - сменить режим выбора цели у выбранной башни
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_t and self.selected_tower is not None:
+            sim.submit('cycle_target_mode', self.selected_tower)
 
-    selected_tower = None
-    clock = pygame.time.Clock()
-    last_time = pygame.time.get_ticks()
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            mouse_pos = event.pos
+            if tower_button.rect.collidepoint(mouse_pos):
+                if latest.money >= 50:
+                    self.placing_mode = True
+                    self.show_message("Режим установки: кликните на карте")
+                else:
+                    self.show_message("Недостаточно денег! Нужно 50 монет")
+            elif upgrade_button.rect.collidepoint(mouse_pos) and self.selected_tower is not None:
+                sim.submit('upgrade_tower', self.selected_tower)
+            elif menu_button.rect.collidepoint(mouse_pos):
+                self.suspend()
+                self.manager.switch("menu")
+            else:
+                if self.placing_mode:
+                    sim.submit('place_tower', mouse_pos[0], mouse_pos[1])
+                    self.placing_mode = False
+                else:
+                    # Клик проверяется по копии сеток занятости из снимка
+                    self.selected_tower = latest.occupancy.tower_index(*mouse_pos)
+                    if self.selected_tower is not None and self.selected_tower < len(latest.towers):
+                        tower = latest.towers[self.selected_tower]
+                        self.show_message(f"Цель башни: {TARGET_MODE_NAMES[tower.target_mode]} (T - сменить)")
+
+    def update(self, delta_time):
+        sim = self.sim
+        if sim.error is not None:
+            self.abort(sim.error)
+            return
+        for name, _, result in sim.drain_results():
+            if name == 'profile_report':
+                self.save_profile(result)
+            elif name in PLAYER_COMMANDS:
+                self.show_message(result[1])
+        self.handle_game_events(sim.drain_events())
+        if sim.snapshots[1].game_over and not self.record_saved:
+            sim.stop()
+            self.save_result()
+
+        if self.message_timer > 0:
+            self.message_timer -= delta_time
+            if self.message_timer <= 0:
+                self.message = ""
+
+    def toggle_hint(self):
+        self.show_hint = not self.show_hint
+        if self.show_hint and 'hint' not in self.layers:
+            game = self.game
+            self.layers['hint'] = build_hint_layer(self.layers['background'],
+                                                   coverage_map(game.screen_width, game.screen_height))
+        # Фон сменился - перерисовываем весь кадр
+        self.dirty_regions.invalidate()
+
+    def abort(self, error):
+        # Симуляция упала: ошибка пишется в телеметрию один раз, партия сохраняется
+        # как при выходе в меню (снимок или результат), и игрок возвращается в меню
+        self.manager.switch("menu")
+        self.manager.telemetry.error(self.manager.frame, error, scene=self.manager.current_name,
+                                     game_tick=self.sim.snapshots[1].tick)
+        self.suspend()
+
+    def toggle_profiler(self):
+        # Таймер симуляции подменяется командой в ее потоке, замеры тика приходят в снимках
+        if self.profiler is None:
+            self.profiler = PhaseTimer()
+            self.sim.submit('set_profiler', PhaseTimer())
+        else:
+            self.profiler = None
+            self.sim.submit('set_profiler', None)
+        self.profiler_panel = None
+
+    def dump_profile(self):
+        # Замеры симуляции и память собираются в ее потоке, файл пишется по результату команды
+        if self.profiler is None:
+            self.show_message("Сначала включите профилировщик (F3)")
+            return
+        self.sim.submit('profile_report')
+
+    def save_profile(self, report):
+        if self.profiler is None:
+            return
+        report['fps'] = round(self.manager.clock.get_fps(), 1)
+        report['ui'] = self.profiler.stats()
+        try:
+            path = dump_profile(report)
+        except OSError as e:
+            self.telemetry.error(report['tick'], e)
+            self.show_message("Не удалось сохранить профиль")
+            return
+        self.show_message(f"Профиль сохранен: {path}")
+
+    def handle_game_events(self, events):
+        for event in events:
+            if isinstance(event, WaveStarted):
+                self.show_message(f"Волна {event.wave}!")
+            elif isinstance(event, EnemySpawned) and event.kind == BOSS_KIND:
+                self.show_message("Босс на поле!")
 
-    # Сообщения интерфейса
-    message = ""
-    message_timer = 0
-    placing_mode = False
+    def draw(self, surface):
+        game = self.game
+        # Кадр рисуется по снимкам симуляции: враги и снаряды - между двумя последними тиками
+        latest, enemies, projectiles = self.sim.frame()
+        dirty = self.dirty_regions
+        layers = self.layers
+        mouse_pos = pygame.mouse.get_pos()
+        profiler = self.profiler
+
+        # Кадр после конца игры меняется только при наведении на кнопки и сообщениях
+        if latest.game_over:
+            over_state = (tower_button.rect.collidepoint(mouse_pos), upgrade_button.rect.collidepoint(mouse_pos),
+                          menu_button.rect.collidepoint(mouse_pos), self.message, self.show_cache_stats,
+                          profiler is not None)
+            if over_state == self.last_over_state:
+                return
+            self.last_over_state = over_state
+            dirty.invalidate()
+
+        # Башни меняются редко (установка, улучшение, выбор) - тогда перерисовываем все
+        tower_state = (self.selected_tower, latest.towers)
+        if tower_state != self.last_tower_state:
+            self.last_tower_state = tower_state
+            dirty.invalidate()
+
+        # Стираем подвижные объекты прошлого кадра статическим фоном
+        dirty.restore(surface, layers['hint'] if self.show_hint else layers['background'])
+        if profiler is not None:
+            profiler.mark('draw_background')
+
+        # Рисуем врагов
+        for enemy in enemies:
+            dirty.add(draw_enemy(surface, enemy))
+        if profiler is not None:
+            profiler.mark('draw_enemies')
+
+        # Рисуем снаряды
+        for projectile in projectiles:
+            dirty.add(draw_projectile(surface, projectile))
+        if profiler is not None:
+            profiler.mark('draw_projectiles')
+
+        # Рисуем башни
+        for i, tower in enumerate(latest.towers):
+            draw_tower(surface, tower, i == self.selected_tower)
+        if profiler is not None:
+            profiler.mark('draw_towers')
+
+        # Панель информации
+        surface.blit(layers['panel'], (0, 0))
+
+        stats = (
+            f"Игрок: {game.player_name}",
+            f"Волна: {latest.wave}",
+            f"Жизни: {latest.lives}",
+            f"Деньги: {latest.money}$",
+            f"Очки: {latest.score}"
+        )
+
+        for i, stat in enumerate(stats):
+            text = text_cache.render(font_medium, stat, WHITE)
+            surface.blit(text, (SCREEN_WIDTH - 250, 30 + i * 35))
 
-    def show_message(text, duration=2000):
-        nonlocal message, message_timer
-        message = text
-        message_timer = duration
+        # Кнопки
+        tower_button.check_hover(mouse_pos)
+        upgrade_button.check_hover(mouse_pos)
+        menu_button.check_hover(mouse_pos)
+
+        tower_button.draw(surface)
+        upgrade_button.draw(surface)
+        menu_button.draw(surface)
+
+        hud_state = (stats, tower_button.is_hovered, upgrade_button.is_hovered, menu_button.is_hovered)
+        if hud_state != self.last_hud_state:
+            self.last_hud_state = hud_state
+            dirty.mark(layers['panel'].get_rect())
+        if profiler is not None:
+            profiler.mark('draw_hud')
+
+        if self.message:
+            msg_surface = text_cache.render(font_medium, self.message, YELLOW)
+            dirty.add(surface.blit(msg_surface, (SCREEN_WIDTH // 2 - msg_surface.get_width() // 2, 250)))
+
+        if self.placing_mode:
+            # Место под курсором проверяется по маске и сеткам занятости из снимка - без перебора башен
+            valid, reason = check_placement(latest.occupancy, *mouse_pos)
+            preview = pygame.draw.circle(surface, GREEN if valid else RED, mouse_pos, 20, 2)
+            preview.union_ip(pygame.draw.circle(surface, (100, 100, 255, 100), mouse_pos, 100, 1))
+
+            placing_text = text_cache.render(font_small, "Кликните для установки башни" if valid else reason,
+                                             YELLOW if valid else RED)
+            preview.union_ip(surface.blit(placing_text, (mouse_pos[0] + 30, mouse_pos[1] - 20)))
+            dirty.add(preview)
+
+        if latest.game_over:
+            surface.blit(layers['overlay'], (0, 0))
+
+            game_over = text_cache.render(font_large, "ИГРА ОКОНЧЕНА!", RED)
+            surface.blit(game_over, (SCREEN_WIDTH // 2 - game_over.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
+
+            score_text = text_cache.render(font_medium, f"Ваш результат: Волна {latest.wave}, Очки {latest.score}", WHITE)
+            surface.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, SCREEN_HEIGHT // 2 + 20))
+
+            continue_text = text_cache.render(font_small, "Нажмите 'Главное меню' для выхода", YELLOW)
+            surface.blit(continue_text,
+                         (SCREEN_WIDTH // 2 - continue_text.get_width() // 2, SCREEN_HEIGHT // 2 + 80))
+
+        if self.show_cache_stats:
+            # Рендерим мимо кэша, чтобы не портить статистику
+            stats = text_cache.stats()
+            stats_text = font_small.render(
+                f"Кэш текста: {stats['hit_rate']:.1%} попаданий, {stats['size']}/{stats['maxsize']}", True, WHITE)
+            dirty.add(surface.blit(stats_text, (10, SCREEN_HEIGHT - 30)))
+
+        if profiler is not None:
+            profiler.mark('draw_overlays')
+            if self.profiler_panel is None or profiler.frame_count % 15 == 0:
+                self.profiler_panel = render_profiler(layers['profiler'], profiler, latest,
+                                                      self.manager.clock.get_fps())
+            dirty.add(surface.blit(self.profiler_panel, (SCREEN_WIDTH - self.profiler_panel.get_width() - 10, 230)))
+            profiler.mark('draw_profiler')
+
+        # На экран уходят только изменившиеся области
+        dirty.present(pygame.display)
+        if profiler is not None:
+            profiler.mark('present')
 
-    while True:
-        try:
-            mouse_pos = pygame.mouse.get_pos()
-            current_time = pygame.time.get_ticks()
-            delta_time = current_time - last_time
-            last_time = current_time
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        if tower_button.rect.collidepoint(mouse_pos):
-                            if game.money >= 50:
-                                placing_mode = True
-                                show_message("Режим установки: кликните на карте")
-                            else:
-                                show_message("Недостаточно денег! Нужно 50 монет")
-                        elif upgrade_button.rect.collidepoint(mouse_pos) and selected_tower is not None:
-                            success, msg = game.upgrade_tower(selected_tower)
-                            show_message(msg)
-                        elif menu_button.rect.collidepoint(mouse_pos):
-                            if not game.game_over:
-                                save_record(game.player_name, game.wave, game.score)
-                            return
-                        else:
-                            if placing_mode:
-                                success, msg = game.place_tower(mouse_pos[0], mouse_pos[1])
-                                show_message(msg)
-                                placing_mode = False
-                            else:
-                                selected_tower = None
-                                for i, tower in enumerate(game.towers):
-                                    distance = math.sqrt((tower.x - mouse_pos[0]) ** 2 + (tower.y - mouse_pos[1]) ** 2)
-                                    if distance < 30:
-                                        selected_tower = i
-                                        break
-
-            if not game.game_over:
-                game.update(delta_time)
-
-            if message_timer > 0:
-                message_timer -= delta_time
-                if message_timer <= 0:
-                    message = ""
-
-            screen.fill(BACKGROUND)
-
-            # Рисуем путь
-            for i in range(len(game.path) - 1):
-                pygame.draw.line(screen, GRAY, game.path[i], game.path[i + 1], 30)
-
-            # Рисуем базу
-            pygame.draw.circle(screen, GREEN, (game.base_x, game.base_y), 30)
-            pygame.draw.circle(screen, BLACK, (game.base_x, game.base_y), 30, 2)
-
-            # Рисуем врагов
-            for enemy in game.enemies:
-                if enemy.hit_effect > 0:
-                    pygame.draw.circle(screen, (255, 100, 100), (int(enemy.x), int(enemy.y)), 18)
-
-                pygame.draw.circle(screen, enemy.color, (int(enemy.x), int(enemy.y)), 15)
-                pygame.draw.circle(screen, BLACK, (int(enemy.x), int(enemy.y)), 15, 2)
-
-                # ПОЛОСКА ЗДОРОВЬЯ (ИСПРАВЛЕННЫЙ РАСЧЕТ)
-                health_percent = max(0, enemy.health / enemy.max_health)
-                health_width = int(30 * health_percent)  # Явное преобразование в int
-
-                # Фон полоски (красный)
-                pygame.draw.rect(screen, RED, (enemy.x - 15, enemy.y - 30, 30, 7))
-
-                # Зеленая часть (текущее здоровье)
-                health_color = GREEN
-                if enemy.hit_effect > 0:
-                    health_color = YELLOW
-                pygame.draw.rect(screen, health_color, (enemy.x - 15, enemy.y - 30, health_width, 7))
-
-                # Контур
-                pygame.draw.rect(screen, BLACK, (enemy.x - 15, enemy.y - 30, 30, 7), 1)
-
-                # Текст здоровья
-                health_text = font_small.render(f"{int(enemy.health)}/{int(enemy.max_health)}", True, WHITE)
-                screen.blit(health_text, (enemy.x - health_text.get_width() // 2, enemy.y - 45))
-
-                # Особый рендеринг для босса
-                if hasattr(enemy, 'type') and enemy.type == 'boss':
-                    # Больший размер
-                    pygame.draw.circle(screen, enemy.color, (int(enemy.x), int(enemy.y)), 25)
-                    pygame.draw.circle(screen, BLACK, (int(enemy.x), int(enemy.y)), 25, 2)
-
-                    # Коронка над боссом
-                    crown_points = [
-                        (enemy.x - 20, enemy.y - 30),
-                        (enemy.x, enemy.y - 50),
-                        (enemy.x + 20, enemy.y - 30),
-                        (enemy.x + 15, enemy.y - 40),
-                        (enemy.x, enemy.y - 55),
-                        (enemy.x - 15, enemy.y - 40)
-                    ]
-                    pygame.draw.polygon(screen, (255, 215, 0), crown_points)
-                    pygame.draw.polygon(screen, BLACK, crown_points, 2)
-
-                    # Текст "BOSS"
-                    boss_text = font_small.render("BOSS", True, BLACK)
-                    screen.blit(boss_text, (enemy.x - boss_text.get_width() // 2, enemy.y - 70))
-            # Рисуем снаряды
-            for tower in game.towers:
-                for projectile in tower.projectiles:
-                    pygame.draw.circle(screen, YELLOW, (int(projectile.x), int(projectile.y)), 5)
-                    pygame.draw.circle(screen, ORANGE, (int(projectile.x), int(projectile.y)), 3)
-
-                    if len(projectile.trail) > 1:
-                        for i in range(1, len(projectile.trail)):
-                            prev_pos = projectile.trail[i - 1]
-                            curr_pos = projectile.trail[i]
-                            pygame.draw.line(screen, (255, 255, 0), prev_pos, curr_pos, 2)
-
-            # Рисуем башни
-            for i, tower in enumerate(game.towers):
-                color = YELLOW if i == selected_tower else BLUE
-                pygame.draw.circle(screen, color, (int(tower.x), int(tower.y)), 20)
-                pygame.draw.circle(screen, BLACK, (int(tower.x), int(tower.y)), 20, 2)
-
-                level_text = font_small.render(f"{tower.level}", True, WHITE)
-                damage_text = font_small.render(f"{tower.damage}", True, (255, 200, 0))
-                screen.blit(level_text, (tower.x - 5, tower.y - 8))
-                screen.blit(damage_text, (tower.x - 10, tower.y + 10))
-
-                if i == selected_tower:
-                    pygame.draw.circle(screen, (100, 100, 100, 100), (int(tower.x), int(tower.y)), tower.range, 1)
-
-            # Панель информации
-            pygame.draw.rect(screen, (40, 40, 70), (0, 0, SCREEN_WIDTH, 220))
-            pygame.draw.line(screen, WHITE, (0, 220), (SCREEN_WIDTH, 220), 2)
-
-            stats = [
-                f"Игрок: {game.player_name}",
-                f"Волна: {game.wave}",
-                f"Жизни: {game.lives}",
-                f"Деньги: {game.money}$",
-                f"Очки: {game.score}"
-            ]
-
-            for i, stat in enumerate(stats):
-                text = font_medium.render(stat, True, WHITE)
-                screen.blit(text, (SCREEN_WIDTH - 250, 30 + i * 35))
-
-            # Кнопки
-            tower_button.check_hover(mouse_pos)
-            upgrade_button.check_hover(mouse_pos)
-            menu_button.check_hover(mouse_pos)
-
-            tower_button.draw(screen)
-            upgrade_button.draw(screen)
-            menu_button.draw(screen)
-
-            if message:
-                msg_surface = font_medium.render(message, True, YELLOW)
-                screen.blit(msg_surface, (SCREEN_WIDTH // 2 - msg_surface.get_width() // 2, 250))
-
-            if placing_mode:
-                pygame.draw.circle(screen, (200, 200, 200, 150), mouse_pos, 20, 2)
-                pygame.draw.circle(screen, (100, 100, 255, 100), mouse_pos, 100, 1)
-
-                placing_text = font_small.render("Кликните для установки башни", True, YELLOW)
-                screen.blit(placing_text, (mouse_pos[0] + 30, mouse_pos[1] - 20))
-
-            if game.game_over:
-                overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-                overlay.fill((0, 0, 0, 180))
-                screen.blit(overlay, (0, 0))
-
-                game_over = font_large.render("ИГРА ОКОНЧЕНА!", True, RED)
-                screen.blit(game_over, (SCREEN_WIDTH // 2 - game_over.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
-
-                score_text = font_medium.render(f"Ваш результат: Волна {game.wave}, Очки {game.score}", True, WHITE)
-                screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, SCREEN_HEIGHT // 2 + 20))
-
-                save_record(game.player_name, game.wave, game.score)
-
-                continue_text = font_small.render("Нажмите 'Главное меню' для выхода", True, YELLOW)
-                screen.blit(continue_text,
-                            (SCREEN_WIDTH // 2 - continue_text.get_width() // 2, SCREEN_HEIGHT // 2 + 80))
-
-            pygame.display.flip()
-            clock.tick(60)
-
-        except Exception as e:
-            print(f"Ошибка: {e}")
-            pygame.quit()
-            sys.exit()
 
 # Основной игровой цикл
 def main():
-    current_screen = "menu"
-    player_name = ""
-
-    while True:
-        if current_screen == "menu":
-            current_screen = main_menu()
-        elif current_screen == "name_input":
-            player_name = name_input_screen()
-            current_screen = "game"
-        elif current_screen == "game":
-            game_screen(player_name)
-            current_screen = "menu"
-        elif current_screen == "records":
-            show_records()
-            current_screen = "menu"
+    manager = SceneManager(screen)
+    manager.add("menu", MenuScene(manager))
+    manager.add("name_input", NameInputScene(manager))
+    manager.add("records", RecordsScene(manager))
+    manager.add("game", GameScene(manager))
+    manager.run("menu")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,128 @@
+import copy
+from functools import lru_cache
+
+import numpy as np
+
+# Причины, по которым в пиксель нельзя поставить башню (значения статической маски)
+FREE = 0
+OUT_OF_BOUNDS = 1
+ON_PATH = 2
+UNDER_PANEL = 3
+# Не из маски: слишком близко к поставленной башне
+TOO_CLOSE = 4
+
+# Башня не должна задевать дорогу и панель интерфейса
+TOWER_RADIUS = 20
+ROAD_HALF_WIDTH = 15
+PATH_CLEARANCE = ROAD_HALF_WIDTH + TOWER_RADIUS
+# Клик ближе этого к центру башни выбирает ее
+HIT_RADIUS = 30
+
+NO_TOWER = -1
+
+
+def _disk(radius):
+    # Смещения пикселей, лежащих строго ближе radius к центру, в виде булевой маски
+    r = int(np.ceil(radius))
+    offsets = np.arange(-r, r + 1)
+    return offsets[None, :] ** 2 + offsets[:, None] ** 2 < radius * radius
+
+
+@lru_cache(maxsize=8)
+def static_mask(width, height, path, margin, panel_height):
+    # Попиксельная маска с причиной запрета: края поля, коридор дороги, панель интерфейса.
+    # Считается один раз на размер поля и путь; массив только для чтения и общий для всех игр
+    mask = np.full((height, width), OUT_OF_BOUNDS, dtype=np.uint8)
+    mask[margin:height - margin + 1, margin:width - margin + 1] = FREE
+
+    ys, xs = np.mgrid[0:height, 0:width]
+    near_path = np.zeros((height, width), dtype=bool)
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        length2 = dx * dx + dy * dy
+        if length2:
+            t = np.clip(((xs - x0) * dx + (ys - y0) * dy) / length2, 0.0, 1.0)
+        else:
+            t = 0.0
+        px = xs - (x0 + t * dx)
+        py = ys - (y0 + t * dy)
+        near_path |= px * px + py * py < PATH_CLEARANCE * PATH_CLEARANCE
+    mask[(mask == FREE) & near_path] = ON_PATH
+    mask[(mask == FREE) & (ys < panel_height + TOWER_RADIUS)] = UNDER_PANEL
+    mask.flags.writeable = False
+    return mask
+
+
+class Occupancy:
+    # Сетки поля для проверок за O(1): статическая маска запретов, пиксели
+    # ближе spacing к башням (blocked) и номер башни под каждым пикселем для кликов
+    # (tower_at). Башни отпечатываются в сетки при установке готовыми дисками.
+    # view() отдает неизменяемую копию для другого потока: сетки общие, пока
+    # следующая установка не скопирует их перед записью
+    def __init__(self, width, height, path, margin, panel_height, spacing):
+        self.width = width
+        self.height = height
+        self.mask = static_mask(width, height, tuple(map(tuple, path)), margin, panel_height)
+        self.blocked = np.zeros((height, width), dtype=bool)
+        self.tower_at = np.full((height, width), NO_TOWER, dtype=np.int16)
+        self.spacing_disk = _disk(spacing)
+        self.hit_disk = _disk(HIT_RADIUS)
+        self.shared = False
+
+    def view(self):
+        view = copy.copy(self)
+        self.shared = True
+        return view
+
+    def _window(self, x, y, disk):
+        # Срезы сетки и диска для отпечатка с центром в (x, y), обрезанные по краям поля
+        r = disk.shape[0] // 2
+        x, y = int(round(x)), int(round(y))
+        top, bottom = max(0, y - r), min(self.height, y + r + 1)
+        left, right = max(0, x - r), min(self.width, x + r + 1)
+        if top >= bottom or left >= right:
+            return None, None
+        return (slice(top, bottom), slice(left, right)), \
+            disk[top - (y - r):bottom - (y - r), left - (x - r):right - (x - r)]
+
+    def add(self, index, x, y):
+        if self.shared:
+            self.blocked = self.blocked.copy()
+            self.tower_at = self.tower_at.copy()
+            self.shared = False
+        window, disk = self._window(x, y, self.spacing_disk)
+        if window is not None:
+            self.blocked[window] |= disk
+        window, disk = self._window(x, y, self.hit_disk)
+        if window is not None:
+            # При пересечении дисков клик выбирает башню, поставленную раньше
+            cells = self.tower_at[window]
+            cells[disk & (cells == NO_TOWER)] = index
+
+    def reason(self, x, y):
+        # Причина запрета в точке или FREE; blocked проверяется отдельно
+        x, y = int(round(x)), int(round(y))
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return OUT_OF_BOUNDS
+        return int(self.mask[y, x])
+
+    def is_blocked(self, x, y):
+        return bool(self.blocked[int(round(y)), int(round(x))])
+
+    def check(self, x, y):
+        # Причина, по которой в точку нельзя поставить башню, или FREE
+        reason = self.reason(x, y)
+        if reason == FREE and self.is_blocked(x, y):
+            return TOO_CLOSE
+        return reason
+
+    def tower_index(self, x, y):
+        # Номер башни под точкой или None
+        x, y = int(round(x)), int(round(y))
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        index = int(self.tower_at[y, x])
+        return None if index == NO_TOWER else index
+
+    def nbytes(self):
+        return self.blocked.nbytes + self.tower_at.nbytes
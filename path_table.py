@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class PathTable:
+    # Путь врагов, скомпилированный один раз: длины отрезков, накопленная
+    # длина пути до начала каждого отрезка и единичные направления.
+    # Положение врага - одно число progress (пройденное расстояние),
+    # x/y по нему считаются без корней
+    def __init__(self, points):
+        self.points = [tuple(point) for point in points]
+        self.x = np.array([point[0] for point in points], dtype=np.float64)
+        self.y = np.array([point[1] for point in points], dtype=np.float64)
+        dx = np.diff(self.x)
+        dy = np.diff(self.y)
+        self.lengths = np.sqrt(dx * dx + dy * dy)
+        self.starts = np.concatenate(([0.0], np.cumsum(self.lengths)[:-1]))
+        # Отрезки нулевой длины не двигают врага, направление у них нулевое
+        safe = np.where(self.lengths > 0, self.lengths, 1.0)
+        self.dir_x = dx / safe
+        self.dir_y = dy / safe
+        self.length = float(self.lengths.sum())
+
+    def segments(self, progress):
+        # Номер отрезка для каждого значения progress (progress >= 0)
+        return self.starts.searchsorted(progress, side='right') - 1
+
+    def positions(self, progress):
+        # Координаты точек пути по массиву progress
+        segment = self.segments(progress)
+        offset = progress - self.starts[segment]
+        return (self.x[segment] + self.dir_x[segment] * offset,
+                self.y[segment] + self.dir_y[segment] * offset)
+
+    def intervals_within(self, cx, cy, radius):
+        # Участки пути внутри круга радиуса radius - массив пар (progress_from, progress_to).
+        # Точка отрезка p0 + d * t, |p0 + d * t - c|^2 <= r^2 - квадратное уравнение по t
+        intervals = []
+        for segment, length in enumerate(self.lengths.tolist()):
+            if length <= 0:
+                continue
+            fx = self.x[segment] - cx
+            fy = self.y[segment] - cy
+            b = fx * self.dir_x[segment] + fy * self.dir_y[segment]
+            c = fx * fx + fy * fy - radius * radius
+            discriminant = b * b - c
+            if discriminant < 0:
+                continue
+            root = discriminant ** 0.5
+            t0 = max(0.0, -b - root)
+            t1 = min(length, -b + root)
+            if t0 > t1:
+                continue
+            start = float(self.starts[segment])
+            # Соседние участки на стыке отрезков склеиваем
+            if intervals and intervals[-1][1] >= start + t0:
+                intervals[-1] = (intervals[-1][0], start + t1)
+            else:
+                intervals.append((start + t0, start + t1))
+        return np.array(intervals, dtype=np.float64).reshape(-1, 2)
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from entity_types import TOWER_TYPE
+from game_logic import Game, SCREEN_WIDTH, SCREEN_HEIGHT, TOWER_SPACING, PLACEMENT_MARGIN
+from policies import ScriptedPolicy
+from occupancy import FREE
+
+# Шаг сетки позиций-кандидатов (пиксели) и число уровней башни в карте покрытия
+GRID_STEP = 20
+HEATMAP_LEVELS = 10
+
+# Как часто (в тиках) бот принимает решения при оценке плана
+ACT_EVERY = 30
+
+PLAN_DIR = 'plans'
+
+
+def level_ranges(levels=HEATMAP_LEVELS):
+    # Радиус башни на уровнях 1..levels по таблице TOWER_TYPE
+    return TOWER_TYPE.range + TOWER_TYPE.range_step * np.arange(levels, dtype=np.float64)
+
+
+def path_coverage(path_table, xs, ys, radii):
+    # Длина пути внутри круга радиуса r для каждой точки (xs[i], ys[i]) и каждого r.
+    # Для отрезка p0 + d * t, t в [0, 1], участок в круге - отрезок [t1, t2] из
+    # квадратного уравнения; круг выпуклый, поэтому длины по отрезкам просто суммируются.
+    # Все считается сразу массивами формы (радиусы, точки, отрезки)
+    px = xs[None, :, None] - path_table.x[None, None, :-1]
+    py = ys[None, :, None] - path_table.y[None, None, :-1]
+    dx = (path_table.x[1:] - path_table.x[:-1])[None, None, :]
+    dy = (path_table.y[1:] - path_table.y[:-1])[None, None, :]
+    a = dx * dx + dy * dy
+    safe_a = np.where(a > 0, a, 1.0)
+    # (p0 - c) = -p, поэтому b = -2 d·p
+    b = -2.0 * (dx * px + dy * py)
+    c = px * px + py * py - radii[:, None, None] ** 2
+    disc = b * b - 4.0 * a * c
+    root = np.sqrt(np.maximum(disc, 0.0))
+    t1 = np.clip((-b - root) / (2.0 * safe_a), 0.0, 1.0)
+    t2 = np.clip((-b + root) / (2.0 * safe_a), 0.0, 1.0)
+    inside = np.where((disc > 0) & (a > 0), t2 - t1, 0.0)
+    return (inside * path_table.lengths[None, None, :]).sum(axis=2)
+
+
+class CoverageMap:
+    # Сколько пути (пиксели) покрывает башня в каждой клетке сетки на каждом уровне.
+    # coverage[level - 1, row, column] для точки (xs[column], ys[row]).
+    # valid[row, column] - можно ли поставить башню в клетку по маске occupancy.static_mask
+    def __init__(self, path_table, width, height, mask, step=GRID_STEP, levels=HEATMAP_LEVELS):
+        self.step = step
+        self.xs = np.arange(PLACEMENT_MARGIN, width - PLACEMENT_MARGIN + 1, step, dtype=np.float64)
+        self.ys = np.arange(PLACEMENT_MARGIN, height - PLACEMENT_MARGIN + 1, step, dtype=np.float64)
+        self.radii = level_ranges(levels)
+        grid_x, grid_y = np.meshgrid(self.xs, self.ys)
+        self.valid = mask[grid_y.astype(np.intp), grid_x.astype(np.intp)] == FREE
+        coverage = path_coverage(path_table, grid_x.ravel(), grid_y.ravel(), self.radii)
+        self.coverage = coverage.reshape(levels, len(self.ys), len(self.xs))
+
+    @property
+    def levels(self):
+        return len(self.radii)
+
+    def level_map(self, level):
+        return self.coverage[min(max(level, 1), self.levels) - 1]
+
+    def at(self, x, y, level=1):
+        # Покрытие в ближайшей клетке сетки или 0 вне сетки
+        column = int(round((x - self.xs[0]) / self.step))
+        row = int(round((y - self.ys[0]) / self.step))
+        if 0 <= row < len(self.ys) and 0 <= column < len(self.xs):
+            return float(self.level_map(level)[row, column])
+        return 0.0
+
+    def best_spots(self, count, level=1, spacing=TOWER_SPACING):
+        # Жадно: допустимые клетки по убыванию покрытия, не ближе spacing к уже выбранным
+        values = np.where(self.valid, self.level_map(level), 0.0).ravel()
+        order = np.argsort(-values, kind='stable')
+        columns = len(self.xs)
+        chosen_x = []
+        chosen_y = []
+        for cell in order.tolist():
+            if len(chosen_x) == count or values[cell] <= 0:
+                break
+            x = float(self.xs[cell % columns])
+            y = float(self.ys[cell // columns])
+            if chosen_x:
+                dx = np.array(chosen_x) - x
+                dy = np.array(chosen_y) - y
+                if (dx * dx + dy * dy).min() < spacing * spacing:
+                    continue
+            chosen_x.append(x)
+            chosen_y.append(y)
+        return [(int(x), int(y)) for x, y in zip(chosen_x, chosen_y)]
+
+
+@lru_cache(maxsize=4)
+def coverage_map(width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+    # Карта покрытия для пути стандартной игры; путь зависит только от размеров поля
+    game = Game(width, height)
+    return CoverageMap(game.path_table, width, height, game.occupancy.mask)
+
+
+def play_plan(spots, seed, towers_first, max_level, max_wave, max_ticks):
+    # Одна безголовая партия бота с заданным планом. Возвращает (волна, очки)
+    game = Game(SCREEN_WIDTH, SCREEN_HEIGHT, seed=seed)
+    policy = ScriptedPolicy(spots, towers_first, max_level)
+    game.start_wave()
+    while not game.game_over and game.wave <= max_wave and game.tick < max_ticks:
+        policy.act(game)
+        game.step(ACT_EVERY)
+    return game.wave, game.score
+
+
+def _play_plan(args):
+    return play_plan(*args)
+
+
+class PlanEvaluator:
+    # Приспособленность плана - средние очки партий на фиксированных seed.
+    # Партии всех планов поколения раздаются процессам одним пакетом
+    def __init__(self, seeds, towers_first, max_level, max_wave, max_ticks, workers=None):
+        self.seeds = list(seeds)
+        self.towers_first = towers_first
+        self.max_level = max_level
+        self.max_wave = max_wave
+        self.max_ticks = max_ticks
+        self.executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self.games = 0
+
+    def evaluate(self, plans):
+        jobs = [(plan, seed, self.towers_first, self.max_level, self.max_wave, self.max_ticks)
+                for plan in plans for seed in self.seeds]
+        results = list(self.executor.map(_play_plan, jobs, chunksize=max(1, len(self.seeds))))
+        self.games += len(jobs)
+        scores = np.array([score for _, score in results], dtype=np.float64).reshape(len(plans), len(self.seeds))
+        return scores.mean(axis=1).tolist()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def greedy_search(evaluator, candidates, length, log=None):
+    # План строится по одной позиции: на каждом шаге добавляется кандидат,
+    # с которым план набирает больше всего очков
+    plan = []
+    best = 0.0
+    for _ in range(min(length, len(candidates))):
+        options = [spot for spot in candidates if spot not in plan]
+        scores = evaluator.evaluate([plan + [spot] for spot in options])
+        index = int(np.argmax(scores))
+        plan.append(options[index])
+        best = scores[index]
+        if log is not None:
+            log(f"{len(plan)}: {options[index]} очки {best:.0f}")
+    return plan, best
+
+
+def evolve_search(evaluator, candidates, length, generations, population, rng, log=None):
+    # Эволюция планов: лучшая половина переходит в следующее поколение, остальные -
+    # ее мутанты (замена позиции неиспользованным кандидатом или перестановка двух позиций)
+    length = min(length, len(candidates))
+    plans = [candidates[:length]]
+    while len(plans) < population:
+        plans.append(rng.sample(candidates, length))
+    scores = evaluator.evaluate(plans)
+    for generation in range(generations):
+        ranked = sorted(zip(scores, plans), key=lambda item: -item[0])
+        parents = [plan for _, plan in ranked[:max(1, population // 2)]]
+        children = []
+        while len(parents) + len(children) < population:
+            child = list(rng.choice(parents))
+            unused = [spot for spot in candidates if spot not in child]
+            if unused and rng.random() < 0.7:
+                child[rng.randrange(length)] = rng.choice(unused)
+            else:
+                i, j = rng.randrange(length), rng.randrange(length)
+                child[i], child[j] = child[j], child[i]
+            children.append(child)
+        plans = parents + children
+        scores = [score for score, _ in ranked[:len(parents)]] + evaluator.evaluate(children)
+        if log is not None:
+            log(f"поколение {generation + 1}: лучшие очки {max(scores):.0f}")
+    index = int(np.argmax(scores))
+    return plans[index], scores[index]
+
+
+def save_plan(path, plan, towers_first, max_level, fitness, method):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'spots': plan, 'towers_first': towers_first, 'max_level': max_level,
+                   'fitness': round(fitness, 1), 'method': method}, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Карта покрытия пути и подбор расстановки башен")
+    parser.add_argument('--method', choices=('heatmap', 'greedy', 'evolve'), default='greedy',
+                        help="heatmap - лучшие клетки карты без симуляции")
+    # Расстановку оценивает слабый бот (мало башен, низкий предел уровня): сильный
+    # доживает до предела волн при любой разумной расстановке, и планы не различаются
+    parser.add_argument('--length', type=int, default=3, help="позиций в плане")
+    parser.add_argument('--candidates', type=int, default=16, help="кандидатов из карты покрытия")
+    parser.add_argument('--level', type=int, default=2, help="уровень башни, по покрытию которого отбираются кандидаты")
+    parser.add_argument('--towers-first', type=int, default=None, help="по умолчанию - все позиции плана")
+    parser.add_argument('--max-level', type=int, default=2)
+    parser.add_argument('--seeds', type=int, default=2, help="партий на оценку плана")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-wave', type=int, default=40)
+    parser.add_argument('--max-ticks', type=int, default=500000)
+    parser.add_argument('--generations', type=int, default=10)
+    parser.add_argument('--population', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=os.path.join(PLAN_DIR, 'plan.json'), help="файл плана")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    coverage = coverage_map()
+    candidates = coverage.best_spots(args.candidates, args.level)
+    print(f"Карта покрытия: {coverage.coverage.shape[2]}x{coverage.coverage.shape[1]} клеток, "
+          f"{coverage.levels} уровней, {time.perf_counter() - started:.2f} с")
+
+    towers_first = args.length if args.towers_first is None else args.towers_first
+    evaluator = PlanEvaluator(range(args.seed, args.seed + args.seeds), towers_first, args.max_level,
+                              args.max_wave, args.max_ticks, args.workers)
+    try:
+        if args.method == 'heatmap':
+            plan = candidates[:args.length]
+            fitness = evaluator.evaluate([plan])[0]
+        elif args.method == 'greedy':
+            plan, fitness = greedy_search(evaluator, candidates, args.length, log=print)
+        else:
+            plan, fitness = evolve_search(evaluator, candidates, args.length, args.generations,
+                                          args.population, random.Random(args.seed), log=print)
+    finally:
+        evaluator.close()
+
+    save_plan(args.out, plan, towers_first, args.max_level, fitness, args.method)
+    print(f"План {args.out}: {plan}, очки {fitness:.0f}, партий {evaluator.games}, "
+          f"{time.perf_counter() - started:.1f} с")
+    print(f"Прогон бота: python balance_runner.py --policy plan:{args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import argparse
+import json
+
+from game_logic import TOWER_COST
+
+# Позиции башен вокруг пути на поле 1000x700, от самых выгодных к менее выгодным:
+# сначала перекресток у базы, затем вдоль последнего отрезка и нижней дороги
+PATH_SPOTS = [
+    (800, 300), (800, 400), (900, 400), (900, 300),
+    (700, 300), (700, 400), (800, 500),
+    (600, 300), (600, 400), (700, 500),
+    (500, 300), (500, 400), (600, 500),
+    (400, 300), (400, 400), (500, 500),
+    (300, 300), (300, 400), (400, 500),
+    (200, 300), (200, 400), (300, 500),
+    (100, 400), (200, 500),
+]
+
+
+class ScriptedPolicy:
+    # Скриптовый игрок для безголовых прогонов: ставит башни по списку позиций
+    # и улучшает самую слабую башню, когда хватает денег
+    def __init__(self, spots, towers_first=4, max_level=6):
+        self.spots = list(spots)
+        self.towers_first = towers_first
+        self.max_level = max_level
+        self.next_spot = 0
+
+    def act(self, game):
+        while True:
+            if len(game.towers) < self.towers_first and self._place(game):
+                continue
+            if self._upgrade(game):
+                continue
+            if self._place(game):
+                continue
+            return
+
+    def _place(self, game):
+        while game.money >= TOWER_COST and self.next_spot < len(self.spots):
+            x, y = self.spots[self.next_spot]
+            self.next_spot += 1
+            success, _ = game.place_tower(x, y)
+            if success:
+                return True
+        return False
+
+    def _upgrade(self, game):
+        candidates = [i for i, tower in enumerate(game.towers) if tower.level < self.max_level]
+        if not candidates:
+            return False
+        index = min(candidates, key=lambda i: (game.towers[i].level, i))
+        if game.money < game.towers[index].upgrade_cost:
+            return False
+        success, _ = game.upgrade_tower(index)
+        return success
+
+
+def heatmap_spots(count=len(PATH_SPOTS), level=3):
+    # Лучшие по карте покрытия пути клетки (см. placement.py); модуль импортируется
+    # здесь, потому что сам placement строит планы на ScriptedPolicy
+    from placement import coverage_map
+    return coverage_map().best_spots(count, level)
+
+
+def load_plan(path):
+    # План из placement.py: позиции по порядку и параметры бота
+    with open(path, encoding='utf-8') as f:
+        plan = json.load(f)
+    return ScriptedPolicy([tuple(spot) for spot in plan['spots']],
+                          plan.get('towers_first', 4), plan.get('max_level', 6))
+
+
+POLICIES = {
+    # Ничего не строит - нижняя граница баланса
+    'idle': lambda: ScriptedPolicy([]),
+    # Несколько башен, затем равномерные улучшения
+    'path': lambda: ScriptedPolicy(PATH_SPOTS, towers_first=4),
+    # Сначала застраивает все позиции, потом улучшает
+    'spam': lambda: ScriptedPolicy(PATH_SPOTS, towers_first=len(PATH_SPOTS)),
+    # Мало башен, но высокие уровни
+    'upgrade': lambda: ScriptedPolicy(PATH_SPOTS, towers_first=2, max_level=20),
+    # Позиции с наибольшим покрытием пути по карте покрытия
+    'heatmap': lambda: ScriptedPolicy(heatmap_spots(), towers_first=4),
+}
+
+# Префикс имени стратегии для плана из файла: plan:plans/plan.json
+PLAN_PREFIX = 'plan:'
+
+
+def make_policy(name):
+    if name.startswith(PLAN_PREFIX):
+        try:
+            return load_plan(name[len(PLAN_PREFIX):])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Ошибка чтения плана {name}: {e}") from e
+    if name not in POLICIES:
+        raise ValueError(f"Неизвестная стратегия: {name}")
+    return POLICIES[name]()
+
+
+def policy_arg(name):
+    # Тип аргумента --policy: имя из POLICIES или plan:<файл>
+    try:
+        make_policy(name)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return name
@@ -0,0 +1,103 @@
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+# Границы корзин гистограммы времени кадра (мс)
+HISTOGRAM_EDGES = (0, 2, 4, 8, 12, 16.7, 25, 33.3, 50, float('inf'))
+
+PROFILE_DIR = 'profiles'
+
+
+class PhaseTimer:
+    # Время по фазам кадра (или тика симуляции). Фазы отмечаются «кругами»:
+    # mark(phase) относит к фазе время с предыдущей отметки, так что на фазу
+    # уходит один вызов часов. Кто не хочет платить за замеры, просто не
+    # создает таймер: в коде проверяется только «таймер есть или нет»
+    def __init__(self, history=600):
+        self.clock = time.perf_counter_ns
+        self.totals = {}
+        self.calls = {}
+        self.maxima = {}
+        # Длительности последних кадров (нс) для гистограммы и перцентилей
+        self.frames = deque(maxlen=history)
+        self.frame_count = 0
+        self.frame_start = self.last = self.clock()
+
+    def start(self):
+        self.frame_start = self.last = self.clock()
+
+    def mark(self, phase):
+        now = self.clock()
+        elapsed = now - self.last
+        self.last = now
+        if phase in self.totals:
+            self.totals[phase] += elapsed
+            self.calls[phase] += 1
+            if elapsed > self.maxima[phase]:
+                self.maxima[phase] = elapsed
+        else:
+            self.totals[phase] = elapsed
+            self.calls[phase] = 1
+            self.maxima[phase] = elapsed
+
+    def end_frame(self):
+        self.frames.append(self.clock() - self.frame_start)
+        self.frame_count += 1
+
+    def reset(self):
+        self.totals.clear()
+        self.calls.clear()
+        self.maxima.clear()
+        self.frames.clear()
+        self.frame_count = 0
+
+    def frame_times_ms(self):
+        return np.array(list(self.frames), dtype=np.float64) / 1e6
+
+    def histogram(self):
+        counts, _ = np.histogram(self.frame_times_ms(), bins=HISTOGRAM_EDGES)
+        return counts.tolist()
+
+    def phase_means_ms(self):
+        # Среднее время фазы на кадр (мс), по убыванию
+        frames = max(1, self.frame_count)
+        means = {phase: total / frames / 1e6 for phase, total in self.totals.items()}
+        return dict(sorted(means.items(), key=lambda item: -item[1]))
+
+    def stats(self):
+        times = self.frame_times_ms()
+        totals, calls, maxima = self.totals, self.calls, self.maxima
+        total = sum(totals.values()) or 1
+        frame_ms = {}
+        if len(times):
+            p50, p90, p99 = np.percentile(times, (50, 90, 99))
+            frame_ms = {'mean': round(float(times.mean()), 3), 'p50': round(float(p50), 3),
+                        'p90': round(float(p90), 3), 'p99': round(float(p99), 3), 'max': round(float(times.max()), 3)}
+        return {
+            'frames': self.frame_count,
+            'frame_ms': frame_ms,
+            'histogram': {'edges_ms': [edge for edge in HISTOGRAM_EDGES[:-1]], 'counts': self.histogram()},
+            'phases': {
+                phase: {
+                    'calls': calls[phase],
+                    'total_ms': round(totals[phase] / 1e6, 3),
+                    'mean_us': round(totals[phase] / calls[phase] / 1e3, 2),
+                    'max_us': round(maxima[phase] / 1e3, 2),
+                    'share': round(totals[phase] / total, 4),
+                }
+                for phase in totals
+            },
+        }
+
+
+def dump_profile(sections, directory=PROFILE_DIR):
+    # Пишет статистику в profiles/profile_<время>.json и возвращает путь.
+    # OSError передается вызывающему (в игре он уходит в телеметрию)
+    path = os.path.join(directory, time.strftime("profile_%Y%m%d_%H%M%S.json"))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(sections, f, ensure_ascii=False, indent=2)
+    return path
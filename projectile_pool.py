@@ -0,0 +1,170 @@
+import math
+
+import numpy as np
+
+PROJECTILE_SPEED = 8.0
+# Дистанция до точки прицеливания, на которой снаряд взрывается
+HIT_DISTANCE = 10
+# Длина следа за снарядом (точек)
+TRAIL_LENGTH = 5
+
+# Попадание: урон, точка взрыва и номер башни-владельца
+HIT_DTYPE = np.dtype([('damage', np.int64), ('x', np.float64), ('y', np.float64), ('tower', np.int32)])
+NO_HITS = np.zeros(0, dtype=HIT_DTYPE)
+
+
+class ProjectilePool:
+    # Все снаряды игры в переиспользуемых слотах. Слоты освобождаются при
+    # попадании и выдаются заново без выделения памяти; след хранится
+    # в кольцевом буфере фиксированной длины
+    COLUMNS = (
+        ('x', np.float64),
+        ('y', np.float64),
+        ('target_x', np.float64),
+        ('target_y', np.float64),
+        ('dx', np.float64),
+        ('dy', np.float64),
+        ('damage', np.int64),
+        ('tower', np.int32),
+        ('active', np.bool_),
+        ('trail_head', np.int8),
+        ('trail_size', np.int8),
+    )
+
+    def __init__(self, capacity=64):
+        self.capacity = 0
+        # Слоты [0, used) когда-либо выдавались; свободные из них лежат в free
+        self.used = 0
+        self.free = []
+        self.active_count = 0
+        for name, dtype in self.COLUMNS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self.trail = np.zeros((0, TRAIL_LENGTH, 2), dtype=np.float64)
+        self._grow(capacity)
+
+    def __len__(self):
+        return self.active_count
+
+    @classmethod
+    def slot_bytes(cls):
+        # Сколько байт занимает один слот вместе со следом
+        columns = sum(np.dtype(dtype).itemsize for _, dtype in cls.COLUMNS)
+        return columns + TRAIL_LENGTH * 2 * np.dtype(np.float64).itemsize
+
+    def _grow(self, capacity):
+        for name, dtype in self.COLUMNS:
+            column = np.zeros(capacity, dtype=dtype)
+            column[:self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+        trail = np.zeros((capacity, TRAIL_LENGTH, 2), dtype=np.float64)
+        trail[:self.capacity] = self.trail
+        self.trail = trail
+        self.capacity = capacity
+
+    def spawn(self, start_x, start_y, target_x, target_y, damage, tower):
+        # Выпускает снаряд. Возвращает слот или -1, если цель совпадает со стартом
+        dx = target_x - start_x
+        dy = target_y - start_y
+        dist = math.sqrt(dx * dx + dy * dy)
+        if dist <= 0:
+            return -1
+
+        if self.free:
+            slot = self.free.pop()
+        else:
+            if self.used == self.capacity:
+                self._grow(self.capacity * 2)
+            slot = self.used
+            self.used += 1
+
+        self.x[slot] = start_x
+        self.y[slot] = start_y
+        self.target_x[slot] = target_x
+        self.target_y[slot] = target_y
+        self.dx[slot] = dx / dist * PROJECTILE_SPEED
+        self.dy[slot] = dy / dist * PROJECTILE_SPEED
+        self.damage[slot] = damage
+        self.tower[slot] = tower
+        self.active[slot] = True
+        self.trail_head[slot] = 0
+        self.trail_size[slot] = 0
+        self.active_count += 1
+        return slot
+
+    def update(self):
+        # Один тик полета всех снарядов. Возвращает массив попаданий HIT_DTYPE
+        if not self.active_count:
+            return NO_HITS
+        slots = np.flatnonzero(self.active[:self.used])
+
+        # Добавляем текущую позицию в след
+        head = self.trail_head[slots]
+        self.trail[slots, head, 0] = self.x[slots]
+        self.trail[slots, head, 1] = self.y[slots]
+        self.trail_head[slots] = (head + 1) % TRAIL_LENGTH
+        self.trail_size[slots] = np.minimum(self.trail_size[slots] + 1, TRAIL_LENGTH)
+
+        # Обновляем позицию
+        x = self.x[slots] + self.dx[slots]
+        y = self.y[slots] + self.dy[slots]
+        self.x[slots] = x
+        self.y[slots] = y
+
+        # Проверяем достижение цели
+        dx = x - self.target_x[slots]
+        dy = y - self.target_y[slots]
+        arrived = slots[np.sqrt(dx * dx + dy * dy) < HIT_DISTANCE]
+
+        if not len(arrived):
+            return NO_HITS
+        hits = np.zeros(len(arrived), dtype=HIT_DTYPE)
+        hits['damage'] = self.damage[arrived]
+        hits['x'] = self.target_x[arrived]
+        hits['y'] = self.target_y[arrived]
+        hits['tower'] = self.tower[arrived]
+        self.active[arrived] = False
+        self.free.extend(arrived.tolist())
+        self.active_count -= len(arrived)
+        return hits
+
+    def trail_points(self, slot):
+        # Точки следа от старой к новой
+        size = int(self.trail_size[slot])
+        start = int(self.trail_head[slot]) - size
+        return [tuple(self.trail[slot, (start + i) % TRAIL_LENGTH]) for i in range(size)]
+
+    def views(self):
+        return [ProjectileView(self, int(slot)) for slot in np.flatnonzero(self.active[:self.used])]
+
+
+class ProjectileView:
+    # Снаряд для отрисовки поверх слота пула. Действителен до следующего обновления игры
+    __slots__ = ('pool', 'slot')
+
+    def __init__(self, pool, slot):
+        self.pool = pool
+        self.slot = slot
+
+    @property
+    def x(self):
+        return float(self.pool.x[self.slot])
+
+    @property
+    def y(self):
+        return float(self.pool.y[self.slot])
+
+    @property
+    def target_x(self):
+        return float(self.pool.target_x[self.slot])
+
+    @property
+    def target_y(self):
+        return float(self.pool.target_y[self.slot])
+
+    @property
+    def damage(self):
+        return int(self.pool.damage[self.slot])
+
+    @property
+    def trail(self):
+        return self.pool.trail_points(self.slot)
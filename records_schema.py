@@ -0,0 +1,125 @@
+# Схема таблицы рекордов и общие запросы для database.py и leaderboard_server.py.
+# При импорте ничего не открывает и не создает
+
+DB_PATH = 'records.db'
+
+# Сколько лучших записей держится в памяти процесса (и на сервере таблицы лидеров)
+TOP_CACHE_SIZE = 100
+
+# Миграции схемы по порядку. Номер последней примененной хранится в PRAGMA user_version
+MIGRATIONS = [
+    '''
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_name TEXT NOT NULL,
+            wave INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            timestamp TEXT NOT NULL
+        );
+    ''',
+    # Идентификатор игровой сессии: одна сессия - ровно одна запись
+    '''
+        ALTER TABLE records ADD COLUMN session_id TEXT;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_records_session ON records(session_id);
+    ''',
+    # Покрывающий индекс для таблицы лидеров: сортировка и все колонки выборки
+    # берутся из индекса, id - для стабильной постраничной навигации
+    '''
+        CREATE INDEX IF NOT EXISTS idx_records_leaderboard
+            ON records(score DESC, wave DESC, id, player_name, timestamp);
+    ''',
+    # Снимки прерванных партий (snapshot.py), по одному на сессию
+    '''
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL UNIQUE,
+            player_name TEXT NOT NULL,
+            wave INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            data BLOB NOT NULL
+        );
+    ''',
+]
+
+# Вставка пачки записей (player_name, wave, score, timestamp, session_id); повторная сессия пропускается
+INSERT_RECORDS = '''
+    INSERT OR IGNORE INTO records (player_name, wave, score, timestamp, session_id)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def migrate(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.executescript(f'BEGIN; {script} PRAGMA user_version = {number}; COMMIT;')
+
+
+def select_records_page(conn, after, limit):
+    # Страница таблицы по ключу (keyset pagination) на соединении conn: (записи, курсор или None).
+    # Курсор - (score, wave, id) последней записи страницы. У страницы из кэша id записей
+    # неизвестны, ее курсор (score, wave, None, n) - n-я запись с этими score и wave.
+    # Ошибки sqlite3 не перехватываются
+    cursor = conn.cursor()
+    if after is not None and after[2] is None:
+        score, wave, _, skip = after
+        row = cursor.execute('''
+            SELECT id FROM records
+            WHERE score = ? AND wave = ?
+            ORDER BY id
+            LIMIT 1 OFFSET ?
+        ''', (score, wave, skip - 1)).fetchone()
+        after = (score, wave, row[0] if row else 0)
+    if after is None:
+        cursor.execute('''
+            SELECT id, player_name, wave, score, timestamp
+            FROM records
+            ORDER BY score DESC, wave DESC, id
+            LIMIT ?
+        ''', (limit + 1,))
+    else:
+        score, wave, record_id = after
+        cursor.execute('''
+            SELECT id, player_name, wave, score, timestamp
+            FROM records
+            WHERE score <= ?
+              AND (score < ? OR wave < ? OR (wave = ? AND id > ?))
+            ORDER BY score DESC, wave DESC, id
+            LIMIT ?
+        ''', (score, score, wave, wave, record_id, limit + 1))
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        record_id, _, wave, score, _ = rows[-1]
+        next_cursor = (score, wave, record_id)
+    return [row[1:] for row in rows], next_cursor
+
+
+def cached_page(records, after, limit, complete):
+    # Страница из списка лучших записей в памяти (по убыванию (score, wave), как в БД).
+    # after - None или курсор страницы из кэша (score, wave, None, n).
+    # Возвращает (записи, курсор) или None, если страница выходит за список и он неполный
+    start = 0
+    if after is not None:
+        score, wave, _, skip = after
+        seen = 0
+        for start, (_, other_wave, other_score, _) in enumerate(records, start=1):
+            if (other_score, other_wave) == (score, wave):
+                seen += 1
+                if seen == skip:
+                    break
+        else:
+            return None
+    page = records[start:start + limit + 1]
+    if len(page) <= limit:
+        if not complete and start + len(page) >= len(records):
+            return None
+        return page, None
+    page = page[:limit]
+    _, wave, score, _ = page[-1]
+    # Номер последней записи страницы среди всех записей с теми же score и wave
+    skip = sum(1 for _, other_wave, other_score, _ in records[:start + limit]
+               if (other_score, other_wave) == (score, wave))
+    return page, (score, wave, None, skip)
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+
+class TextCache:
+    # Ограниченный LRU-кэш отрисованного текста. Ключ - шрифт, строка и цвет,
+    # поэтому одинаковые надписи рендерятся один раз, а не каждый кадр
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            'size': len(self.surfaces),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate(),
+        }
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class DirtyRegions:
+    # Прямоугольники экрана, изменившиеся за кадр. Динамические области (враги,
+    # снаряды, подсказки) на следующем кадре восстанавливаются из статического фона,
+    # а на экран отправляются только старые и новые области вместо flip()
+    def __init__(self, screen_rect, max_rects=150):
+        self.screen_rect = screen_rect
+        self.max_rects = max_rects
+        self.previous = []
+        self.current = []
+        self.changed = []
+        self.full = True
+
+    def add(self, rect):
+        # Область, нарисованная в этом кадре и стираемая в следующем
+        self.current.append(rect)
+
+    def mark(self, rect):
+        # Область, которая изменилась один раз (например, панель со статистикой)
+        self.changed.append(rect)
+
+    def invalidate(self):
+        self.full = True
+
+    def restore(self, surface, background):
+        if self.full:
+            surface.blit(background, (0, 0))
+            return
+        for rect in self.previous:
+            surface.blit(background, rect, rect)
+
+    def present(self, display):
+        rects = self.previous + self.current + self.changed
+        if self.full or len(rects) > self.max_rects:
+            display.flip()
+        else:
+            display.update([rect.clip(self.screen_rect) for rect in rects])
+        self.previous = self.current
+        self.current = []
+        self.changed = []
+        self.full = False
@@ -0,0 +1,245 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from game_logic import Game
+
+# Формат файла повтора (little-endian):
+#   заголовок  HEADER: магия, версия, размер записи, seed, ширина и высота поля
+#   записи     RECORD: тик, код операции, два аргумента int32
+# Файл только дописывается, все записи одного размера, поэтому его можно
+# отобразить в память и читать как массив. Недописанный хвост игнорируется.
+# Игра в повторе начинается как в main.py: Game(width, height, seed) и start_wave().
+# Партия, продолженная из снимка, дописывается в тот же файл: снимок хранит и
+# состояние генератора, поэтому прогон от seed приходит к тому же состоянию
+MAGIC = b'TDRP'
+# Версия поднимается, когда правила игры меняют исход тех же команд.
+# 2 - башню нельзя ставить на дорогу и под панель (occupancy.py)
+VERSION = 2
+HEADER = struct.Struct('<4sHHqHH4x')
+RECORD = struct.Struct('<IB3xii')
+RECORD_DTYPE = np.dtype({
+    'names': ['tick', 'op', 'a', 'b'],
+    'formats': ['<u4', 'u1', '<i4', '<i4'],
+    'offsets': [0, 4, 8, 12],
+    'itemsize': RECORD.size,
+})
+
+# Коды операций и смысл аргументов a, b
+OP_PLACE = 1  # установка башни: x, y
+OP_UPGRADE = 2  # улучшение башни: индекс, -
+OP_TARGET = 3  # смена режима цели: индекс, -
+OP_CHECKSUM = 4  # контрольная сумма состояния: crc32, -
+OP_END = 5  # конец партии: волна, очки
+OP_NAMES = {OP_PLACE: 'place', OP_UPGRADE: 'upgrade', OP_TARGET: 'target', OP_CHECKSUM: 'checksum', OP_END: 'end'}
+
+# Контрольная сумма пишется не реже чем раз в столько тиков
+CHECKSUM_EVERY = 300
+
+REPLAY_DIR = 'replays'
+
+
+def state_checksum(game):
+    # CRC32 от состояния симуляции: счетчики, враги на поле и башни
+    store = game.enemy_store
+    n = store.count
+    crc = zlib.crc32(struct.pack('<5q', game.tick, game.wave, game.score, game.money, game.lives))
+    for column in (store.progress, store.health, store.kind):
+        crc = zlib.crc32(column[:n].tobytes(), crc)
+    towers = [(tower.x, tower.y, tower.level, tower.target_mode) for tower in game.towers]
+    return zlib.crc32(repr(towers).encode(), crc)
+
+
+def _to_int32(value):
+    # crc32 беззнаковый, а поля записи - int32
+    return value - (1 << 32) if value >= (1 << 31) else value
+
+
+class ReplayRecorder:
+    # Пишет команды игрока и контрольные суммы в файл повтора.
+    # resume - дописывать в существующий повтор той же партии
+    def __init__(self, path, seed, width, height, resume=False):
+        self.path = path
+        header = HEADER.pack(MAGIC, VERSION, RECORD.size, seed, width, height)
+        if resume:
+            self.file = open(path, 'r+b')
+            if self.file.read(HEADER.size) != header:
+                self.file.close()
+                raise ValueError(f"{path}: повтор записан для другой партии или версии")
+            # Недописанный хвост отбрасывается, новые записи идут сразу за последней целой
+            size = self.file.seek(0, os.SEEK_END)
+            self.file.truncate(size - (size - HEADER.size) % RECORD.size)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(header)
+        self.last_checksum = 0
+        self.closed = False
+
+    def _write(self, tick, op, a=0, b=0):
+        if not self.closed:
+            self.file.write(RECORD.pack(tick, op, a, b))
+
+    def place(self, tick, x, y):
+        self._write(tick, OP_PLACE, int(x), int(y))
+
+    def upgrade(self, tick, index):
+        self._write(tick, OP_UPGRADE, index)
+
+    def target(self, tick, index):
+        self._write(tick, OP_TARGET, index)
+
+    def checkpoint(self, game):
+        # Вызывается после шагов симуляции; сумма пишется раз в CHECKSUM_EVERY тиков
+        if game.tick - self.last_checksum >= CHECKSUM_EVERY:
+            self.last_checksum = game.tick
+            self._write(game.tick, OP_CHECKSUM, _to_int32(state_checksum(game)))
+            self.file.flush()
+
+    def close(self, game, end=True):
+        # Финальная сумма и запись конца партии; дальнейшие команды игнорируются.
+        # end=False - партия прервана со снимком и будет дописана при продолжении
+        if self.closed:
+            return
+        self._write(game.tick, OP_CHECKSUM, _to_int32(state_checksum(game)))
+        if end:
+            self._write(game.tick, OP_END, game.wave, game.score)
+        self.file.close()
+        self.closed = True
+
+
+def open_recorder(seed, width, height, name, directory=REPLAY_DIR, resume=False):
+    try:
+        os.makedirs(directory, exist_ok=True)
+        return ReplayRecorder(os.path.join(directory, f"{name}.tdr"), seed, width, height, resume)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка записи повтора: {e}")
+    return None
+
+
+class ReplayFile:
+    # Файл повтора, отображенный в память. records - массив RECORD_DTYPE без копирования
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < HEADER.size:
+            raise ValueError(f"{path}: файл короче заголовка")
+        magic, version, record_size, self.seed, self.width, self.height = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{path}: неизвестный формат повтора")
+        if version != VERSION:
+            raise ValueError(f"{path}: повтор версии {version} записан по старым правилам игры, нужна версия {VERSION}")
+        count = (len(self.mm) - HEADER.size) // RECORD.size
+        self.records = np.frombuffer(self.mm, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+        # Индекс контрольных точек: тики записей-сумм и их позиции
+        self.checkpoints = np.flatnonzero(self.records['op'] == OP_CHECKSUM)
+        self.checkpoint_ticks = self.records['tick'][self.checkpoints]
+
+    def __len__(self):
+        return len(self.records)
+
+    def close(self):
+        self.records = None
+        self.mm.close()
+
+    def records_until(self, tick):
+        # Все записи до тика tick включительно (тики в файле не убывают)
+        end = int(np.searchsorted(self.records['tick'], tick, side='right'))
+        return self.records[:end]
+
+    def checkpoint_before(self, tick):
+        # Позиция последней контрольной точки не позже tick или -1
+        position = int(np.searchsorted(self.checkpoint_ticks, tick, side='right')) - 1
+        return int(self.checkpoints[position]) if position >= 0 else -1
+
+    def end(self):
+        # (волна, очки) из записи конца партии или None, если партия не дописана
+        ends = np.flatnonzero(self.records['op'] == OP_END)
+        if not len(ends):
+            return None
+        record = self.records[ends[-1]]
+        return int(record['a']), int(record['b'])
+
+
+def play(replay, until=None):
+    # Прогоняет повтор без отображения на максимальной скорости и сверяет суммы.
+    # until - остановиться на этом тике. Возвращает (игра, словарь с итогами)
+    started = time.perf_counter()
+    game = Game(replay.width, replay.height, seed=replay.seed)
+    game.start_wave()
+    mismatches = []
+    ended = None
+    records = replay.records if until is None else replay.records_until(until)
+
+    for tick, op, a, b in records.tolist():
+        if tick > game.tick:
+            game.step(tick - game.tick)
+        if op == OP_PLACE:
+            game.place_tower(a, b)
+        elif op == OP_UPGRADE:
+            game.upgrade_tower(a)
+        elif op == OP_TARGET:
+            game.cycle_target_mode(a)
+        elif op == OP_CHECKSUM:
+            if _to_int32(state_checksum(game)) != a:
+                mismatches.append(tick)
+        elif op == OP_END:
+            ended = (a, b)
+    if until is not None and until > game.tick:
+        game.step(until - game.tick)
+
+    result = {
+        'path': replay.path,
+        'seed': replay.seed,
+        'ticks': game.tick,
+        'wave': game.wave,
+        'score': game.score,
+        'checkpoints': len(replay.checkpoints),
+        'mismatches': mismatches,
+        'ok': not mismatches and (ended is None or ended == (game.wave, game.score)),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    if ended is not None:
+        result['recorded_wave'], result['recorded_score'] = ended
+    return game, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка повторов: прогон без экрана и сверка результатов")
+    parser.add_argument('paths', nargs='+', help="файлы повторов .tdr")
+    parser.add_argument('--until', type=int, default=None, help="остановиться на тике")
+    parser.add_argument('--dump', action='store_true', help="вывести записи повтора")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for path in args.paths:
+        try:
+            replay = ReplayFile(path)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка чтения повтора: {e}")
+            failed += 1
+            continue
+        if args.dump:
+            for tick, op, a, b in replay.records.tolist():
+                print(f"{tick:>8} {OP_NAMES.get(op, op):<9} {a} {b}")
+        _, result = play(replay, args.until)
+        replay.close()
+        status = "OK" if result['ok'] else "РАСХОЖДЕНИЕ"
+        print(f"{status} {path}: волна {result['wave']}, очки {result['score']}, тиков {result['ticks']}, "
+              f"{result['seconds']} с")
+        if result['mismatches']:
+            print(f"  контрольные суммы не совпали на тиках: {result['mismatches'][:10]}")
+        if not result['ok']:
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from entity_types import ENEMY_TYPES, ENEMY_KINDS
+from events import EVENT_QUEUE_SIZE
+from game_logic import TICK_MS
+
+# Не больше стольких тиков за один проход: отставание сверх этого отбрасывается
+MAX_CATCH_UP = 5
+
+# Неизменяемые состояния для отрисовки. Интерфейс не трогает Game, пока идет
+# симуляция: он читает только опубликованные снимки
+TowerState = namedtuple('TowerState', ['x', 'y', 'level', 'damage', 'range', 'target_mode'])
+EnemySprite = namedtuple('EnemySprite', ['x', 'y', 'health', 'max_health', 'hit_effect', 'type', 'color'])
+ProjectileSprite = namedtuple('ProjectileSprite', ['x', 'y', 'trail'])
+
+# Снимок после тика tick, опубликованный в момент time (perf_counter).
+# Массивы - копии колонок хранилищ, доступные только для чтения.
+# occupancy - копия сеток занятости (Occupancy.view) для кликов и проверки места,
+# sim_phases - среднее время фаз тика (мс) или None, если профилировщик выключен
+RenderSnapshot = namedtuple('RenderSnapshot', [
+    'tick', 'time', 'wave', 'lives', 'money', 'score', 'game_over', 'pending_enemies', 'towers',
+    'enemy_progress', 'enemy_speed', 'enemy_health', 'enemy_max_health', 'enemy_kind', 'enemy_hit',
+    'projectile_x', 'projectile_y', 'projectile_dx', 'projectile_dy', 'projectile_trails',
+    'occupancy', 'sim_phases',
+])
+
+
+def _frozen(column):
+    column = column.copy()
+    column.flags.writeable = False
+    return column
+
+
+def take_snapshot(game, now):
+    store = game.enemy_store
+    pool = game.projectile_pool
+    n = store.count
+    slots = np.flatnonzero(pool.active[:pool.used])
+    return RenderSnapshot(
+        game.tick, now, game.wave, game.lives, game.money, game.score, game.game_over, game.pending_enemies,
+        tuple(TowerState(tower.x, tower.y, tower.level, tower.damage, tower.range, tower.target_mode)
+              for tower in game.towers),
+        _frozen(store.progress[:n]), _frozen(store.speed[:n]), _frozen(store.health[:n]),
+        _frozen(store.max_health[:n]), _frozen(store.kind[:n]), _frozen(store.hit_effect[:n]),
+        _frozen(pool.x[slots]), _frozen(pool.y[slots]), _frozen(pool.dx[slots]), _frozen(pool.dy[slots]),
+        tuple(tuple(pool.trail_points(slot)) for slot in slots.tolist()),
+        game.occupancy.view(),
+        game.profiler.phase_means_ms() if game.profiler is not None else None,
+    )
+
+
+def interpolate(previous, latest, alpha, path_table):
+    # Враги и снаряды в момент между двумя последними снимками (alpha от 0 до 1).
+    # Враги идут по пути со своей скоростью, снаряды летят по прямой, поэтому
+    # позицию на прошлом тике не нужно искать в прошлом снимке - она
+    # восстанавливается по скорости, и сопоставлять сущности снимков не требуется
+    lag = (latest.tick - previous.tick) * (1.0 - alpha)
+    progress = np.maximum(latest.enemy_progress - latest.enemy_speed * lag, 0.0)
+    xs, ys = path_table.positions(progress)
+    enemies = [
+        EnemySprite(x, y, health, max_health, hit, ENEMY_KINDS[kind], ENEMY_TYPES[kind].color)
+        for x, y, health, max_health, hit, kind in zip(
+            xs.tolist(), ys.tolist(), latest.enemy_health.tolist(), latest.enemy_max_health.tolist(),
+            latest.enemy_hit.tolist(), latest.enemy_kind.tolist())
+    ]
+    projectiles = [
+        ProjectileSprite(x, y, trail)
+        for x, y, trail in zip((latest.projectile_x - latest.projectile_dx * lag).tolist(),
+                               (latest.projectile_y - latest.projectile_dy * lag).tolist(),
+                               latest.projectile_trails)
+    ]
+    return enemies, projectiles
+
+
+class SimulationThread:
+    # Симуляция в отдельном потоке с фиксированным шагом. После каждого прохода
+    # публикуется пара (предыдущий, последний) снимков: пара заменяется целиком
+    # одним присваиванием, так что интерфейс всегда видит согласованные снимки.
+    # Команды игрока (имя метода Game и аргументы) передаются через очередь и
+    # выполняются в потоке симуляции между тиками.
+    # on_command(name, args, result) и on_tick(game, events) вызываются в потоке
+    # симуляции - там можно безопасно читать Game (повтор, телеметрия)
+    def __init__(self, game, on_tick=None, on_command=None, tick_ms=TICK_MS):
+        self.game = game
+        self.on_tick = on_tick
+        self.on_command = on_command
+        self.tick_seconds = tick_ms / 1000
+        self.commands = queue.Queue()
+        # Результаты команд и события симуляции для интерфейса
+        self.results = deque(maxlen=64)
+        self.events = deque(maxlen=EVENT_QUEUE_SIZE)
+        snapshot = take_snapshot(game, time.perf_counter())
+        self.snapshots = (snapshot, snapshot)
+        self.error = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Останавливает поток и выполняет команды, которые он не успел забрать.
+        # Если симуляция упала или партия окончена, команды отбрасываются.
+        # После stop с Game снова можно работать из вызывающего потока
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is None and not self.game.game_over:
+            self._apply_commands()
+        else:
+            self._discard_commands()
+        self.snapshots = (self.snapshots[1], take_snapshot(self.game, time.perf_counter()))
+
+    def submit(self, name, *args):
+        self.commands.put((name, args))
+
+    def drain_results(self):
+        results = []
+        while self.results:
+            results.append(self.results.popleft())
+        return results
+
+    def drain_events(self):
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    def frame(self, now=None):
+        # Враги, снаряды и последний снимок для кадра, который рисуется в момент now
+        previous, latest = self.snapshots
+        now = time.perf_counter() if now is None else now
+        alpha = min(1.0, max(0.0, (now - latest.time) / self.tick_seconds))
+        enemies, projectiles = interpolate(previous, latest, alpha, self.game.path_table)
+        return latest, enemies, projectiles
+
+    def _apply_commands(self):
+        while True:
+            try:
+                name, args = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            result = getattr(self.game, name)(*args)
+            if self.on_command is not None:
+                self.on_command(name, args, result)
+            self.results.append((name, args, result))
+
+    def _discard_commands(self):
+        while True:
+            try:
+                self.commands.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        game = self.game
+        tick = self.tick_seconds
+        next_time = time.perf_counter()
+        try:
+            while self.running and not game.game_over:
+                now = time.perf_counter()
+                if now < next_time:
+                    time.sleep(next_time - now)
+                    continue
+                behind = int((now - next_time) / tick) + 1
+                next_time += behind * tick
+
+                self._apply_commands()
+                game.step(min(behind, MAX_CATCH_UP))
+                events = game.drain_events()
+                if self.on_tick is not None:
+                    self.on_tick(game, events)
+                self.events.extend(events)
+                self.snapshots = (self.snapshots[1], take_snapshot(game, time.perf_counter()))
+        except Exception as e:
+            # Ошибку поднимет интерфейс (см. GameScene.update)
+            self.error = e
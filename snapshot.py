@@ -0,0 +1,179 @@
+import argparse
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from game_logic import Game, Tower, TARGET_MODES, SCREEN_WIDTH, SCREEN_HEIGHT
+from waves import WaveSchedule
+from policies import POLICIES, make_policy, policy_arg
+
+# Снимок полного состояния Game в компактном бинарном виде (little-endian):
+#   HEADER   магия и версия формата
+#   STATE    счетчики игры, таймеры, расписание волны и размеры секций ниже
+#   имя игрока (utf-8), состояние генератора случайных чисел,
+#   башни (TOWER_DTYPE), колонки врагов, колонки и следы снарядов, свободные слоты
+# Путь, сетка и очередь событий не сохраняются: они строятся заново или временные
+MAGIC = b'TDSN'
+VERSION = 1
+HEADER = struct.Struct('<4sH')
+STATE = struct.Struct('<HH?qqqqqqqqII?' 'II?III?' 'IIIII' 'H')
+RNG_STATE = struct.Struct('<625I?d')
+
+TOWER_DTYPE = np.dtype([
+    ('x', '<f8'), ('y', '<f8'), ('range', '<i8'), ('damage', '<i8'), ('cooldown', '<i8'),
+    ('last_shot', '<i8'), ('level', '<i4'), ('upgrade_cost', '<i8'), ('target_mode', 'u1'),
+])
+
+
+def _number(value):
+    # Координаты башен из интерфейса целые - возвращаем их такими же
+    return int(value) if value.is_integer() else value
+
+
+def encode(game):
+    store = game.enemy_store
+    pool = game.projectile_pool
+    schedule = game.wave_schedule
+    name = game.player_name.encode('utf-8')
+
+    parts = [HEADER.pack(MAGIC, VERSION), STATE.pack(
+        game.screen_width, game.screen_height,
+        game.seed is not None, game.seed or 0,
+        game.tick, game.wave, game.score, game.money, game.lives, game.game_time, game.spawn_timer,
+        game.peak_enemies, game.peak_projectiles, game.game_over,
+        # Расписание волны: сами враги не хранятся, только счетчики
+        schedule.regular if schedule else 0, schedule.spawned if schedule else 0,
+        schedule.boss if schedule else False, schedule.spawn_delay if schedule else 0,
+        schedule.group_size if schedule else 0, schedule.wave if schedule else 0,
+        schedule is not None,
+        len(game.towers), store.count, pool.used, len(pool.free), pool.active_count,
+        len(name),
+    ), name]
+
+    _, internal, gauss_next = game.rng.getstate()
+    parts.append(RNG_STATE.pack(*internal, gauss_next is not None, gauss_next or 0.0))
+
+    towers = np.zeros(len(game.towers), dtype=TOWER_DTYPE)
+    for row, tower in enumerate(game.towers):
+        towers[row] = (tower.x, tower.y, tower.range, tower.damage, tower.cooldown, tower.last_shot,
+                       tower.level, tower.upgrade_cost, TARGET_MODES.index(tower.target_mode))
+    parts.append(towers.tobytes())
+
+    for column, _ in store.COLUMNS:
+        parts.append(getattr(store, column)[:store.count].tobytes())
+    for column, _ in pool.COLUMNS:
+        parts.append(getattr(pool, column)[:pool.used].tobytes())
+    parts.append(pool.trail[:pool.used].tobytes())
+    parts.append(np.array(pool.free, dtype='<i4').tobytes())
+    return b''.join(parts)
+
+
+def decode(data):
+    view = memoryview(data)
+    magic, version = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("неизвестный формат снимка")
+    offset = HEADER.size
+    (width, height, has_seed, seed,
+     tick, wave, score, money, lives, game_time, spawn_timer,
+     peak_enemies, peak_projectiles, game_over,
+     regular, spawned, boss, spawn_delay, group_size, schedule_wave, has_schedule,
+     tower_count, enemy_count, pool_used, free_count, active_count,
+     name_length) = STATE.unpack_from(view, offset)
+    offset += STATE.size
+
+    game = Game(width, height, seed=seed if has_seed else None)
+    game.player_name = bytes(view[offset:offset + name_length]).decode('utf-8')
+    offset += name_length
+    game.tick, game.wave, game.score, game.money, game.lives = tick, wave, score, money, lives
+    game.game_time, game.spawn_timer, game.game_over = game_time, spawn_timer, game_over
+    game.peak_enemies, game.peak_projectiles = peak_enemies, peak_projectiles
+
+    *internal, has_gauss, gauss_next = RNG_STATE.unpack_from(view, offset)
+    offset += RNG_STATE.size
+    game.rng.setstate((3, tuple(internal), gauss_next if has_gauss else None))
+
+    if has_schedule:
+        schedule = WaveSchedule(schedule_wave, game.rng)
+        schedule.regular, schedule.spawned, schedule.boss = regular, spawned, boss
+        schedule.spawn_delay, schedule.group_size = spawn_delay, group_size
+        game.wave_schedule = schedule
+
+    def take(dtype, count, shape=()):
+        nonlocal offset
+        dtype = np.dtype(dtype)
+        size = count * dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        array = np.frombuffer(view[offset:offset + size], dtype=dtype)
+        offset += size
+        return array.reshape((count,) + shape)
+
+    for x, y, tower_range, damage, cooldown, last_shot, level, upgrade_cost, target_mode in \
+            take(TOWER_DTYPE, tower_count).tolist():
+        tower = Tower(_number(x), _number(y))
+        tower.range, tower.damage, tower.cooldown, tower.last_shot = tower_range, damage, cooldown, last_shot
+        tower.level, tower.upgrade_cost = level, upgrade_cost
+        tower.target_mode = TARGET_MODES[target_mode]
+        game.add_tower(tower)
+
+    store = game.enemy_store
+    if enemy_count > store.capacity:
+        store._grow(enemy_count)
+    for column, dtype in store.COLUMNS:
+        getattr(store, column)[:enemy_count] = take(dtype, enemy_count)
+    store.count = enemy_count
+
+    pool = game.projectile_pool
+    if pool_used > pool.capacity:
+        pool._grow(pool_used)
+    for column, dtype in pool.COLUMNS:
+        getattr(pool, column)[:pool_used] = take(dtype, pool_used)
+    pool.trail[:pool_used] = take(np.float64, pool_used, pool.trail.shape[1:])
+    pool.used = pool_used
+    pool.free = take('<i4', free_count).tolist()
+    pool.active_count = active_count
+
+    if offset != len(view):
+        raise ValueError("снимок поврежден: неверная длина")
+    return game
+
+
+def save_file(game, path):
+    with open(path, 'wb') as f:
+        f.write(encode(game))
+
+
+def load_file(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def main(argv=None):
+    # Готовит снимок поздней волны для бенчмарков: один раз доигрывает
+    # партию скриптовой стратегией и сохраняет состояние в файл
+    parser = argparse.ArgumentParser(description="Снимок состояния игры на заданной волне")
+    parser.add_argument('out', help="файл снимка")
+    parser.add_argument('--wave', type=int, default=30, help="волна, на которой сделать снимок")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--policy', default='spam', type=policy_arg,
+                        help=f"{', '.join(sorted(POLICIES))} или plan:<файл плана>")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    game = Game(SCREEN_WIDTH, SCREEN_HEIGHT, seed=args.seed)
+    game.start_wave()
+    policy = make_policy(args.policy)
+    while not game.game_over and game.wave < args.wave:
+        policy.act(game)
+        game.step(30)
+    save_file(game, args.out)
+    print(f"Снимок {args.out}: волна {game.wave}, тик {game.tick}, башен {len(game.towers)}, "
+          f"врагов {game.enemy_store.count}, {os.path.getsize(args.out)} байт, "
+          f"{time.perf_counter() - started:.1f} с")
+    return 0 if game.wave >= args.wave else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
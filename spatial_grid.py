@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class SpatialGrid:
+    # Равномерная сетка над позициями врагов. Перестраивается раз за тик
+    # сортировкой строк по номеру клетки: строки одной клетки лежат подряд,
+    # а клетки одного ряда сетки - тоже подряд
+    def __init__(self, width, height, cell_size=50):
+        self.cell_size = cell_size
+        self.cols = width // cell_size + 1
+        self.rows = height // cell_size + 1
+        self.order = np.zeros(0, dtype=np.intp)
+        self.starts = np.zeros(self.cols * self.rows + 1, dtype=np.intp)
+        self.xs = np.zeros(0)
+        self.ys = np.zeros(0)
+
+    def rebuild(self, xs, ys):
+        self.xs = xs
+        self.ys = ys
+        cells_x = np.clip((xs // self.cell_size).astype(np.intp), 0, self.cols - 1)
+        cells_y = np.clip((ys // self.cell_size).astype(np.intp), 0, self.rows - 1)
+        keys = cells_y * self.cols + cells_x
+        self.order = np.argsort(keys, kind='stable')
+        counts = np.bincount(keys, minlength=self.cols * self.rows)
+        self.starts[1:] = np.cumsum(counts)
+
+    def query(self, x, y, radius):
+        # Строки врагов из клеток, задевающих круг, по возрастанию номера,
+        # и расстояния до них. Отбор по радиусу - на стороне вызывающего
+        if len(self.order) == 0:
+            return self.order, self.xs
+        col_from = max(0, int((x - radius) // self.cell_size))
+        col_to = min(self.cols - 1, int((x + radius) // self.cell_size))
+        row_from = max(0, int((y - radius) // self.cell_size))
+        row_to = min(self.rows - 1, int((y + radius) // self.cell_size))
+        if col_from > col_to or row_from > row_to:
+            return self.order[:0], self.xs[:0]
+
+        parts = []
+        for row in range(row_from, row_to + 1):
+            first = self.starts[row * self.cols + col_from]
+            last = self.starts[row * self.cols + col_to + 1]
+            if last > first:
+                parts.append(self.order[first:last])
+        if not parts:
+            return self.order[:0], self.xs[:0]
+
+        # Сортировка сохраняет порядок врагов как при полном переборе
+        candidates = np.sort(np.concatenate(parts))
+        dx = x - self.xs[candidates]
+        dy = y - self.ys[candidates]
+        return candidates, np.sqrt(dx * dx + dy * dy)
+
+    def within(self, x, y, radius):
+        # Все враги строго внутри радиуса
+        candidates, distances = self.query(x, y, radius)
+        return candidates[distances < radius]
@@ -0,0 +1,179 @@
+import json
+import os
+import traceback
+from collections import deque
+
+import numpy as np
+
+from entity_types import ENEMY_KINDS, BOSS_KIND
+from events import EnemyHit, EnemyKilled, EnemyLeaked, WaveStarted, WaveEnded
+
+# Сколько последних записей хранится в памяти (старые вытесняются)
+RING_SIZE = 1024
+# Записи выгружаются в файл пачками по столько штук одним вызовом write
+EXPORT_BATCH = 256
+# Отладочное событие с одним ключом пишется не чаще раза в столько тиков
+DEBUG_INTERVAL = 60
+
+TELEMETRY_DIR = 'telemetry'
+
+
+class Telemetry:
+    # Телеметрия партии вместо отладочных print: счетчики урона и убийств по
+    # башням, утечки по волнам, отладочные события с ограничением частоты.
+    # Записи лежат в кольцевом буфере и пачками выгружаются в JSONL (если задан путь).
+    # Счетчики обновляются из событий симуляции (Game.drain_events), в цикл
+    # симуляции телеметрия не встраивается
+    def __init__(self, path=None, capacity=RING_SIZE, batch=EXPORT_BATCH, debug_interval=DEBUG_INTERVAL):
+        self.path = path
+        self.file = None
+        self.batch = batch
+        self.debug_interval = debug_interval
+        self.recent = deque(maxlen=capacity)
+        self.unsent = []
+        self.exported = 0
+
+        self.tower_damage = {}
+        self.tower_kills = {}
+        self.kills_by_kind = dict.fromkeys(ENEMY_KINDS, 0)
+        self.wave_leaks = {}
+        self.wave = 0
+        # Ограничение частоты: последний тик записи и число пропущенных по ключу
+        self.last_debug = {}
+        self.suppressed = {}
+
+    def record(self, entry_type, tick, **fields):
+        entry = {'type': entry_type, 'tick': tick}
+        entry.update(fields)
+        self.recent.append(entry)
+        if self.path is not None:
+            self.unsent.append(entry)
+            if len(self.unsent) >= self.batch:
+                self.flush()
+
+    def debug(self, key, tick, entry_type='debug', **fields):
+        # Отладочное событие: не чаще раза в debug_interval тиков на ключ,
+        # пропущенные учитываются в поле suppressed следующей записи
+        last = self.last_debug.get(key)
+        if last is not None and tick - last < self.debug_interval:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            return False
+        self.last_debug[key] = tick
+        self.record(entry_type, tick, key=key, suppressed=self.suppressed.pop(key, 0), **fields)
+        return True
+
+    def error(self, tick, exc, **fields):
+        # Исключение с трассировкой; одинаковые ошибки тоже ограничены по частоте
+        key = f"{type(exc).__name__}: {exc}"
+        if self.debug(key, tick, 'error',
+                      traceback=''.join(traceback.format_exception(type(exc), exc, exc.__traceback__)), **fields):
+            # Ошибки выгружаются сразу, не дожидаясь полной пачки
+            self.flush()
+
+    def consume(self, events):
+        # Обновляет счетчики по событиям симуляции
+        for event in events:
+            if isinstance(event, EnemyHit):
+                self.tower_damage[event.tower] = self.tower_damage.get(event.tower, 0) + event.damage * event.targets
+            elif isinstance(event, EnemyKilled):
+                self.tower_kills[event.tower] = self.tower_kills.get(event.tower, 0) + 1
+                self.kills_by_kind[ENEMY_KINDS[event.kind]] += 1
+            elif isinstance(event, EnemyLeaked):
+                self.wave_leaks[self.wave] = self.wave_leaks.get(self.wave, 0) + 1
+                self.record('leak', event.tick, wave=self.wave, kind=ENEMY_KINDS[event.kind])
+            elif isinstance(event, WaveStarted):
+                self.wave = event.wave
+                self.record('wave_start', event.tick, wave=event.wave, enemies=event.enemies, money=event.money)
+            elif isinstance(event, WaveEnded):
+                self.record('wave_end', event.tick, wave=event.wave, leaks=self.wave_leaks.get(event.wave, 0),
+                            tower_damage=self.per_tower(self.tower_damage),
+                            tower_kills=self.per_tower(self.tower_kills))
+
+    def sample(self, game):
+        # Выборочные отладочные события о состоянии поля (раньше - print каждый кадр)
+        store = game.enemy_store
+        for row in np.flatnonzero(store.kind[:store.count] == BOSS_KIND):
+            self.debug('boss', game.tick, health=int(store.health[row]), max_health=int(store.max_health[row]))
+
+    @staticmethod
+    def per_tower(counters):
+        # Счетчик по башням в виде списка по индексу башни
+        size = max(counters, default=-1) + 1
+        return [counters.get(i, 0) for i in range(size)]
+
+    def summary(self):
+        return {
+            'tower_damage': self.per_tower(self.tower_damage),
+            'tower_kills': self.per_tower(self.tower_kills),
+            'kills_by_kind': dict(self.kills_by_kind),
+            'wave_leaks': {str(wave): leaks for wave, leaks in sorted(self.wave_leaks.items())},
+            'suppressed': sum(self.suppressed.values()),
+        }
+
+    def flush(self):
+        if not self.unsent:
+            return
+        try:
+            if self.file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(''.join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.unsent))
+            self.file.flush()
+            self.exported += len(self.unsent)
+        except OSError as e:
+            # Телеметрия не должна ронять игру: выгрузка отключается,
+            # ошибка остается в кольцевом буфере вместе с остальными записями
+            tick = self.unsent[-1]['tick']
+            self.path = None
+            self.unsent = []
+            if self.file is not None:
+                try:
+                    self.file.close()
+                except OSError:
+                    pass
+                self.file = None
+            self.error(tick, e)
+        self.unsent = []
+
+    def restore(self):
+        # Продолжение сессии: счетчики берутся из последней итоговой записи файла,
+        # так что итог по возвращении в игру считается за всю партию
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                last = None
+                for line in f:
+                    entry = json.loads(line)
+                    if entry.get('type') == 'summary':
+                        last = entry
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            self.error(0, e)
+            return False
+        if last is None:
+            return False
+        self.tower_damage = {i: value for i, value in enumerate(last['tower_damage']) if value}
+        self.tower_kills = {i: value for i, value in enumerate(last['tower_kills']) if value}
+        self.kills_by_kind.update(last['kills_by_kind'])
+        self.wave_leaks = {int(wave): leaks for wave, leaks in last['wave_leaks'].items()}
+        return True
+
+    def close(self, tick=0, summary=True, suspended=False):
+        # Итоговая запись и выгрузка остатка; после закрытия записи остаются только в памяти.
+        # suspended - партия прервана и может быть продолжена: итог промежуточный
+        if self.path is None:
+            return
+        if summary:
+            self.record('summary', tick, suspended=suspended, **self.summary())
+        self.flush()
+        self.path = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def open_telemetry(name, directory=TELEMETRY_DIR):
+    # Файл телеметрии партии telemetry/<name>.jsonl; создается при первой выгрузке
+    return Telemetry(os.path.join(directory, f"{name}.jsonl"))
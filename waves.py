@@ -0,0 +1,71 @@
+from itertools import accumulate
+
+import numpy as np
+
+from entity_types import ENEMY_TYPES, BOSS_KIND
+
+# Предел обычных врагов в волне; None - без ограничения
+MAX_WAVE_ENEMIES = 50
+
+# Коды типов, из которых набираются обычные враги, и накопленные веса для rng.choices
+SPAWN_CODES = [code for code, enemy_type in enumerate(ENEMY_TYPES) if enemy_type.weight > 0]
+SPAWN_CUM_WEIGHTS = list(accumulate(ENEMY_TYPES[code].weight for code in SPAWN_CODES))
+
+# Таблицы характеристик по коду типа: значение на волне = base + wave * step
+_SPEED = np.array([t.speed for t in ENEMY_TYPES], dtype=np.float64)
+_SPEED_STEP = np.array([t.speed_per_wave for t in ENEMY_TYPES], dtype=np.float64)
+_HEALTH = np.array([t.health for t in ENEMY_TYPES], dtype=np.int64)
+_HEALTH_STEP = np.array([t.health_per_wave for t in ENEMY_TYPES], dtype=np.int64)
+_REWARD = np.array([t.reward for t in ENEMY_TYPES], dtype=np.int64)
+_REWARD_STEP = np.array([t.reward_per_wave for t in ENEMY_TYPES], dtype=np.int64)
+
+
+class WaveSchedule:
+    # Расписание волны: сколько врагов, босс первым, пауза и размер группы.
+    # Враги не создаются заранее: тип очередной группы выбирается в момент
+    # спавна, а характеристики всех типов считаются один раз на волну
+    def __init__(self, wave, rng, max_enemies=MAX_WAVE_ENEMIES):
+        self.wave = wave
+        self.rng = rng
+
+        # Количество обычных врагов
+        base_enemies = 5
+        wave_multiplier = 1.5
+        count = max(5, int(base_enemies + wave * wave_multiplier))
+        if max_enemies is not None:
+            count = min(count, max_enemies)
+        self.regular = count
+        # Каждую 5-ю волну босс появляется первым
+        self.boss = wave % 5 == 0
+        self.spawned = 0
+
+        self.spawn_delay = max(200, 1000 - wave * 20)  # Задержка между группами (мс)
+        self.group_size = min(5, 2 + wave // 3)  # Врагов в одной группе
+
+        self.speed = _SPEED + wave * _SPEED_STEP
+        self.health = _HEALTH + wave * _HEALTH_STEP
+        self.reward = _REWARD + wave * _REWARD_STEP
+
+    @property
+    def total(self):
+        return self.regular + (1 if self.boss else 0)
+
+    @property
+    def remaining(self):
+        return self.total - self.spawned
+
+    def __len__(self):
+        return self.remaining
+
+    def next_group(self):
+        # Коды типов следующей группы врагов (массив int8)
+        size = min(self.group_size, self.remaining)
+        kinds = []
+        if self.boss and self.spawned == 0:
+            kinds.append(BOSS_KIND)
+        kinds.extend(self.rng.choices(SPAWN_CODES, cum_weights=SPAWN_CUM_WEIGHTS, k=size - len(kinds)))
+        self.spawned += size
+        return np.array(kinds, dtype=np.int8)
+
+    def nbytes(self):
+        return self.speed.nbytes + self.health.nbytes + self.reward.nbytes